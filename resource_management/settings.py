@@ -88,6 +88,36 @@ DATABASES = {
 }
 
 
+# Cache shared by every process serving the app: bank holidays, skill index, DataTables counts...
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Rendered calendars and their invalidation log, which needs a backend incrementing values atomically:
+    # Memcached or Redis once several processes serve the app
+    'calendars': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'calendars',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+RESOURCE_MANAGEMENT_CALENDAR_CACHE = 'calendars'
+
+# Number of rendered calendars each process keeps in memory in front of the shared cache
+RESOURCE_MANAGEMENT_CALENDAR_CACHE_SIZE = 64
+
+# Threads rendering the project blocks of the timeline concurrently, 0 renders them one after another
+RESOURCE_MANAGEMENT_TIMELINE_RENDER_WORKERS = 0
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models import Min, Max
+from .models import Allocation, AllocationDay
+from .recurrence import get_allocation_occurrences
+
+
+def build_allocation_days(allocation):
+    if allocation.end_date is None:
+        return []
+
+    occurrences = get_allocation_occurrences(allocation, allocation.start_date, allocation.end_date)
+
+    return [AllocationDay(allocation_id=allocation.id,
+                          employee_id=allocation.employee_id,
+                          project_id=allocation.project_id,
+                          allocation_type_id=allocation.allocation_type_id,
+                          date=day,
+                          hours=allocation.no_of_hours)
+            for day in sorted(occurrences)]
+
+
+def refresh_allocation_days(allocation_id):
+    """
+    Rewrite the materialized days of a single allocation. Returns the (employee id, first date, last date)
+    ranges of the rows removed and written, for refreshing anything derived from them.
+    """
+    changed_ranges = []
+    with transaction.atomic():
+        previous_days = AllocationDay.objects.filter(allocation_id=allocation_id)
+        changed_ranges += previous_days.values_list('employee_id').annotate(Min('date'), Max('date'))
+        previous_days.delete()
+
+        allocation = Allocation.objects.filter(id=allocation_id)\
+            .prefetch_related('allocation_detail_allocation').first()
+        if allocation is not None:
+            allocation_days = AllocationDay.objects.bulk_create(build_allocation_days(allocation))
+            if allocation_days:
+                changed_ranges.append((allocation.employee_id, allocation_days[0].date, allocation_days[-1].date))
+
+    return changed_ranges
+
+
+def rebuild_allocation_days(batch_size=1000):
+    """ Rebuild the materialized days of every allocation, returns the number of rows written """
+    count = 0
+    with transaction.atomic():
+        AllocationDay.objects.all().delete()
+
+        allocation_days = []
+        allocations = Allocation.objects.prefetch_related('allocation_detail_allocation').order_by('id')
+        for allocation in allocations.iterator(chunk_size=batch_size):
+            allocation_days += build_allocation_days(allocation)
+            if len(allocation_days) >= batch_size:
+                AllocationDay.objects.bulk_create(allocation_days, batch_size=batch_size)
+                count += len(allocation_days)
+                allocation_days = []
+
+        AllocationDay.objects.bulk_create(allocation_days, batch_size=batch_size)
+        count += len(allocation_days)
+
+    return count
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ResourceManagementAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'resource_management_app'
+
+    def ready(self):
+        # Register signal handlers and system checks
+        from . import signals, checks  # noqa: F401
@@ -0,0 +1,79 @@
+from datetime import timedelta
+from django.db.models import Q, Exists, OuterRef
+from .models import Allocation, Employee
+from .capacity import CapacityMatrix
+from .dates import get_location_calendar
+
+
+def get_capacity_employees(start_date, end_date):
+    """ Employees included in capacity planning and employed at some point between the given dates """
+    return Employee.objects.filter(Q(last_date_of_working__isnull=True) | Q(last_date_of_working__gte=start_date),
+                                   include_in_capacity=True, date_of_joining__lte=end_date)\
+        .select_related('job_title')\
+        .order_by('id')
+
+
+def get_unallocated_employees(start_date, end_date):
+    """ Capacity employees with no allocation overlapping the given dates, found with a NOT EXISTS subquery """
+    allocations = Allocation.objects.filter(employee=OuterRef('pk'), start_date__lte=end_date,
+                                            end_date__gte=start_date)
+
+    return get_capacity_employees(start_date, end_date).filter(~Exists(allocations))
+
+
+def get_free_windows(week_starts, weekly_free_hours, min_free_hours, start_date, end_date):
+    """ Runs of consecutive weeks with at least min_free_hours free, e.g. [{'start_date': ..., ...}] """
+    windows = []
+    first_week = None
+    for week, free_hours in enumerate(list(weekly_free_hours) + [None]):
+        if free_hours is not None and free_hours >= min_free_hours:
+            if first_week is None:
+                first_week = week
+        elif first_week is not None:
+            windows.append({'start_date': max(week_starts[first_week], start_date),
+                            'end_date': min(week_starts[week - 1] + timedelta(days=6), end_date),
+                            'no_of_weeks': week - first_week,
+                            'free_hours': sum(weekly_free_hours[first_week:week])})
+            first_week = None
+    return windows
+
+
+def get_availability(start_date, end_date, min_free_hours=1, employees=None):
+    """
+    Free hours per week of every capacity employee, or of the given employees, between the given dates:
+    hours available on their working days (weekends, bank holidays, joining and leaving dates) that are
+    not allocated. Employees with at least one window of weeks having min_free_hours free are ranked by
+    their longest window, then by their free hours in those windows.
+    """
+    first_week = start_date - timedelta(days=start_date.weekday())
+    no_of_weeks = (end_date - first_week).days // 7 + 1
+    week_starts = [first_week + timedelta(weeks=week) for week in range(no_of_weeks)]
+
+    if employees is None:
+        employees = get_capacity_employees(start_date, end_date)
+    working_days, bank_holidays = get_location_calendar(first_week, first_week + timedelta(weeks=no_of_weeks, days=-1))
+    capacity = CapacityMatrix(first_week, no_of_weeks, employees, working_days, bank_holidays).load_allocations()
+    free_hours = capacity.get_weekly_free_hours(start_date, end_date).astype(int).tolist()
+
+    data = []
+    for employee, weekly_free_hours in zip(capacity.employees, free_hours):
+        windows = get_free_windows(week_starts, weekly_free_hours, min_free_hours, start_date, end_date)
+        if windows:
+            data.append({'id': employee.id,
+                         'first_name': employee.first_name,
+                         'last_name': employee.last_name,
+                         'job_title': employee.job_title.name if employee.job_title else None,
+                         'location': employee.location,
+                         'free_hours': sum(weekly_free_hours),
+                         'weekly_free_hours': weekly_free_hours,
+                         'windows': windows})
+
+    data.sort(key=lambda employee: (-max(window['no_of_weeks'] for window in employee['windows']),
+                                    -sum(window['free_hours'] for window in employee['windows']),
+                                    employee['first_name']))
+
+    return {'start_date': start_date,
+            'end_date': end_date,
+            'min_free_hours': min_free_hours,
+            'weeks': week_starts,
+            'employees': data}
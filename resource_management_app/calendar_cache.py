@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from datetime import date
+from random import randrange
+from threading import Lock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+CALENDAR_CACHE_KEY = 'resource_management_app.calendar'
+INVALIDATION_SEQUENCE_KEY = 'resource_management_app.calendar.invalidation'
+# Invalidations kept in the shared cache. Entries older than that many invalidations are rebuilt
+INVALIDATION_LOG_SIZE = 256
+INVALIDATION_TIMEOUT = 24 * 60 * 60
+
+EVERY_DATE = (date.min, date.max)
+
+
+class CalendarCache:
+    """
+    Two tier cache of rendered calendars keyed by view, date range and filters: a small LRU in the process
+    in front of the shared Django cache.
+
+    Saving or deleting anything shown on a calendar records the date range it touches in an invalidation
+    log kept in the shared cache. Every entry remembers the last invalidation it has seen when it was built
+    and is only dropped when a later invalidation overlaps its dates, so both tiers of every process stay
+    in step without evicting the windows that were not touched.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        # Invalidated (start date, end date) by sequence number, as read from the shared log
+        self.invalidations = {}
+        self.lock = Lock()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'RESOURCE_MANAGEMENT_CALENDAR_CACHE', 'default')]
+
+    @staticmethod
+    def get_key(view, start_date, end_date, filters):
+        filters = '.'.join('{}={}'.format(name, value) for name, value in sorted((filters or {}).items()))
+        return '{}.{}.{}.{}.{}'.format(CALENDAR_CACHE_KEY, view, start_date, end_date, filters)
+
+    @staticmethod
+    def get_invalidation_key(sequence):
+        return '{}.{}'.format(INVALIDATION_SEQUENCE_KEY, sequence)
+
+    def get_sequence(self):
+        """ Number of the last invalidation, reading the ones this process has not seen yet """
+        sequence = self.cache.get(INVALIDATION_SEQUENCE_KEY, 0)
+
+        first_sequence = max(sequence - INVALIDATION_LOG_SIZE + 1, 1)
+        missing = [number for number in range(first_sequence, sequence + 1) if number not in self.invalidations]
+        if missing:
+            keys = {self.get_invalidation_key(number): number for number in missing}
+            logged = self.cache.get_many(keys.keys())
+            with self.lock:
+                for key, number in keys.items():
+                    # An invalidation that has expired from the shared cache could have been anything
+                    self.invalidations[number] = logged.get(key, EVERY_DATE)
+                for number in [number for number in self.invalidations if number < first_sequence]:
+                    del self.invalidations[number]
+
+        return sequence
+
+    def is_valid(self, built_sequence, start_date, end_date, sequence):
+        if not 0 <= sequence - built_sequence < INVALIDATION_LOG_SIZE:
+            return False
+
+        for number in range(built_sequence + 1, sequence + 1):
+            invalid_start, invalid_end = self.invalidations.get(number, EVERY_DATE)
+            if invalid_start <= end_date and invalid_end >= start_date:
+                return False
+        return True
+
+    def lookup(self, key, start_date, end_date):
+        """ (Sequence number to store a value built now under, value cached for the key or None) """
+        sequence = self.get_sequence()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if self.is_valid(entry[0], start_date, end_date, sequence):
+                    self.entries.move_to_end(key)
+                    return sequence, entry[1]
+                del self.entries[key]
+
+        entry = self.cache.get(key)
+        if entry is None or not self.is_valid(entry[0], start_date, end_date, sequence):
+            return sequence, None
+
+        self.keep(key, entry)
+        return sequence, entry[1]
+
+    def keep(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def store(self, key, sequence, value):
+        # Invalidations recorded while building have a later sequence number and drop the entry
+        entry = (sequence, value)
+        self.cache.set(key, entry)
+        self.keep(key, entry)
+
+    def get_or_build(self, view, start_date, end_date, filters, build):
+        """ Cached value of build() for the view, dates and filters, building and storing it when missing """
+        key = self.get_key(view, start_date, end_date, filters)
+        sequence, value = self.lookup(key, start_date, end_date)
+
+        if value is None:
+            value = build()
+            self.store(key, sequence, value)
+        return value
+
+    async def aget_or_build(self, view, start_date, end_date, filters, build):
+        """ get_or_build() for async views, awaiting build() and the shared cache """
+        key = self.get_key(view, start_date, end_date, filters)
+        sequence, value = await sync_to_async(self.lookup)(key, start_date, end_date)
+
+        if value is None:
+            value = await build()
+            await sync_to_async(self.store)(key, sequence, value)
+        return value
+
+    def invalidate(self, start_date=None, end_date=None):
+        """ Drop the cached calendars overlapping the given dates, every one of them without dates """
+        if start_date is None or end_date is None:
+            start_date, end_date = EVERY_DATE
+
+        # Concurrent invalidations only get different numbers from a backend incrementing atomically, see
+        # checks.py. Numbering starts anywhere so that entries built before the sequence was lost from the
+        # shared cache can't be mistaken for recent ones
+        self.cache.add(INVALIDATION_SEQUENCE_KEY, randrange(1, 2 ** 40) * INVALIDATION_LOG_SIZE, None)
+        try:
+            sequence = self.cache.incr(INVALIDATION_SEQUENCE_KEY)
+        except ValueError:
+            # Evicted in between
+            return self.invalidate(start_date, end_date)
+
+        self.cache.set(self.get_invalidation_key(sequence), (start_date, end_date), INVALIDATION_TIMEOUT)
+
+
+calendar_cache = CalendarCache(getattr(settings, 'RESOURCE_MANAGEMENT_CALENDAR_CACHE_SIZE', 64))
@@ -0,0 +1,122 @@
+from datetime import timedelta
+import numpy as np
+from django.db.models import Sum
+from .models import AllocationDay
+
+# numpy counts days from 1970-01-01 which was a Thursday (weekday 3)
+EPOCH_WEEKDAY = 3
+
+
+class CapacityMatrix:
+    """
+    Employees x days matrix of allocated hours for a window of whole weeks starting on start_date.
+
+    Hours are read from the materialized AllocationDay table with a single GROUP BY query and scattered
+    into the matrix with array operations instead of a Python loop per employee, day and booking.
+    """
+
+    def __init__(self, start_date, no_of_weeks, employees, working_days=None, bank_holidays=None):
+        self.start_date = start_date
+        self.no_of_weeks = no_of_weeks
+        self.no_of_days = no_of_weeks * 7
+        self.end_date = start_date + timedelta(days=self.no_of_days - 1)
+        self.employees = list(employees)
+        self.employee_index = {employee.id: index for index, employee in enumerate(self.employees)}
+
+        self.days = np.arange(np.datetime64(start_date, 'D'), np.datetime64(start_date, 'D') + self.no_of_days)
+        self.weekdays = (self.days.astype(np.int64) + EPOCH_WEEKDAY) % 7
+        self.hours = np.zeros((len(self.employees), self.no_of_days))
+        self.standard_hours = np.array([employee.standard_hours for employee in self.employees], dtype=float)
+        # employees x days flags from the per-location calendar, see dates.get_location_calendar()
+        self.working_days = self.get_location_mask(working_days or {}, self.weekdays < 5)
+        self.bank_holidays = self.get_location_mask(bank_holidays or {}, np.zeros(self.no_of_days, dtype=bool))
+
+    def get_location_mask(self, location_days, default):
+        location_masks = {location: np.array(days, dtype=bool) for location, days in location_days.items()}
+
+        return np.array([location_masks.get(employee.location, default) for employee in self.employees],
+                        dtype=bool).reshape(len(self.employees), self.no_of_days)
+
+    def load_allocations(self):
+        # Allocated hours per employee per day, aggregated over the materialized AllocationDay table
+        self.add_hours(self.get_hours_queryset())
+        return self
+
+    def get_hours_queryset(self):
+        return self.get_daily_hours_queryset(self.start_date, self.end_date, self.employee_index.keys())
+
+    @staticmethod
+    def get_daily_hours_queryset(start_date, end_date, employee_ids=None):
+        """ (employee id, date, allocated hours) rows between the given dates, of every employee by default """
+        allocation_days = AllocationDay.objects.filter(date__range=(start_date, end_date))
+        if employee_ids is not None:
+            allocation_days = allocation_days.filter(employee_id__in=employee_ids)
+
+        return allocation_days.values('employee_id', 'date')\
+            .annotate(total_hours=Sum('hours'))\
+            .values_list('employee_id', 'date', 'total_hours')
+
+    def add_hours(self, rows):
+        # Rows of employees outside the matrix are ignored
+        rows = [row for row in rows if row[0] in self.employee_index]
+        if not rows:
+            return
+
+        employee_ids, dates, hours = zip(*rows)
+
+        employee_rows = np.array([self.employee_index[employee_id] for employee_id in employee_ids])
+        day_offsets = (np.array(dates, dtype='datetime64[D]') - np.datetime64(self.start_date, 'D')).astype(np.int64)
+
+        np.add.at(self.hours, (employee_rows, day_offsets), np.array(hours, dtype=float))
+
+    def get_capacity(self):
+        # Available hours per employee per day
+        return self.standard_hours[:, None] * self.working_days
+
+    def get_daily_hours(self):
+        # Hours booked on a bank holiday are not worked
+        return np.where(self.bank_holidays, 0, self.hours)
+
+    def get_weekly_hours(self):
+        hours = self.get_daily_hours()
+        return hours.reshape(len(self.employees), self.no_of_weeks, 7).sum(axis=2)
+
+    def get_weekly_capacity(self):
+        return self.get_capacity().reshape(len(self.employees), self.no_of_weeks, 7).sum(axis=2)
+
+    def get_employment_mask(self, start_date, end_date):
+        """ Days between the given dates on which each employee has joined and not yet left """
+        first_days = np.array([max(employee.date_of_joining, start_date) for employee in self.employees],
+                              dtype='datetime64[D]')
+        last_days = np.array([min(employee.last_date_of_working or end_date, end_date) for employee in self.employees],
+                             dtype='datetime64[D]')
+
+        return (self.days >= first_days[:, None]) & (self.days <= last_days[:, None])
+
+    def get_weekly_free_hours(self, start_date, end_date):
+        """ Available hours not allocated yet per employee per week, counting days between the given dates """
+        free_hours = np.clip(self.get_capacity() - self.get_daily_hours(), 0, None)
+        free_hours *= self.get_employment_mask(start_date, end_date)
+        return free_hours.reshape(len(self.employees), self.no_of_weeks, 7).sum(axis=2)
+
+    def get_period_totals(self, period_starts, last_day):
+        """
+        Allocated and available hours per employee for consecutive periods (e.g. months) starting on
+        the given dates, the last period ending on last_day
+        """
+        offsets = [(period_start - self.start_date).days for period_start in period_starts]
+        no_of_days = (last_day - self.start_date).days + 1
+
+        hours = np.add.reduceat(self.get_daily_hours()[:, :no_of_days], offsets, axis=1)
+        capacity = np.add.reduceat(self.get_capacity()[:, :no_of_days], offsets, axis=1)
+        return hours, capacity
+
+    @staticmethod
+    def get_utilization(hours, capacity):
+        """ Allocated hours as a percentage of available hours """
+        utilization = np.divide(hours * 100, capacity, out=np.zeros_like(hours, dtype=float), where=capacity > 0)
+        return np.rint(utilization).astype(int)
+
+    def get_weekly_utilization(self):
+        """ Allocated hours as a percentage of available hours, per employee per week """
+        return self.get_utilization(self.get_weekly_hours(), self.get_weekly_capacity())
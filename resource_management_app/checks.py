@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.checks import Error, Tags, register
+
+# Backends whose incr() reads then writes the value, so that concurrent calls can return the same number
+NON_ATOMIC_CACHES = (DatabaseCache, DummyCache, FileBasedCache)
+
+
+@register(Tags.caches)
+def check_calendar_cache(app_configs, **kwargs):
+    """ The calendar invalidation log is numbered with incr(), see calendar_cache.py """
+    alias = getattr(settings, 'RESOURCE_MANAGEMENT_CALENDAR_CACHE', 'default')
+    if alias not in settings.CACHES:
+        return [Error("RESOURCE_MANAGEMENT_CALENDAR_CACHE names the cache '{}', missing from CACHES.".format(alias),
+                      id='resource_management_app.E001')]
+
+    backend = caches[alias]
+    if isinstance(backend, NON_ATOMIC_CACHES):
+        return [Error("The calendar cache '{}' can't increment a value atomically.".format(alias),
+                      hint='Use Memcached or Redis, shared by every process serving the app, or the local memory '
+                           'cache when a single process serves it.',
+                      obj=settings.CACHES[alias]['BACKEND'],
+                      id='resource_management_app.E002')]
+    return []
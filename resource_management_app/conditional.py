@@ -0,0 +1,74 @@
+from hashlib import md5
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Value, IntegerField
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def get_validators(request, *querysets):
+    """
+    Strong ETag and Last-Modified timestamp for a response built from the rows of the given querysets,
+    from their latest updated_at and their count so that deletions show too. Fetched for every queryset
+    at once with a single UNION ALL query.
+    """
+    parts = [queryset.order_by()
+             .annotate(part=Value(index, output_field=IntegerField()))
+             .values('part')
+             .annotate(last_modified=Max('updated_at'), count=Count('pk'))
+             .values_list('part', 'last_modified', 'count')
+             for index, queryset in enumerate(querysets)]
+
+    rows = sorted(parts[0].union(*parts[1:], all=True))
+
+    etag = '"{}"'.format(md5(repr((request.get_full_path(), request.META.get('HTTP_ACCEPT'), rows)).encode()).hexdigest())
+    last_modified = max((last_modified for part, last_modified, count in rows if last_modified), default=None)
+
+    return etag, last_modified.timestamp() if last_modified else None
+
+
+def conditional_response(request, querysets, render):
+    """
+    Answer 304 Not Modified when the request's If-None-Match or If-Modified-Since still match the
+    querysets, before render() does any work. Otherwise render the response and set its validators.
+    """
+    etag, last_modified = get_validators(request, *querysets)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    return set_validators(render(), etag, last_modified)
+
+
+async def aconditional_response(request, querysets, render):
+    """ conditional_response() for async views, awaiting render() """
+    etag, last_modified = await sync_to_async(get_validators)(request, *querysets)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    return set_validators(await render(), etag, last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    if 200 <= response.status_code < 300:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalDataTablesMixin:
+    """ Conditional GET for the ?datatables=1 JSON of list views, see conditional_response() """
+
+    def get_validator_querysets(self):
+        # Tables the datatables rows are read from, the model's own by default
+        return [self.model.objects.all()]
+
+    def get(self, request, *args, **kwargs):
+        if not request.GET.get("datatables"):
+            return super().get(request, *args, **kwargs)
+
+        return conditional_response(request, self.get_validator_querysets(),
+                                    lambda: super(ConditionalDataTablesMixin, self).get(request, *args, **kwargs))
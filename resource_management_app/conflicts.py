@@ -0,0 +1,94 @@
+from .models import Allocation
+from .recurrence import expand_recurrence, get_allocation_occurrences
+
+
+class IntervalIndex:
+    """
+    Static interval tree over (start, end, item) triples. Intervals are kept sorted by start, laid out as
+    an implicit balanced binary search tree, with the maximum end of every subtree, so finding the
+    intervals overlapping a range visits O(log n + k) nodes.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.max_ends = [None] * len(self.intervals)
+        self.build(0, len(self.intervals) - 1)
+
+    def build(self, low, high):
+        if low > high:
+            return None
+
+        middle = (low + high) // 2
+        max_end = self.intervals[middle][1]
+        for child_max_end in (self.build(low, middle - 1), self.build(middle + 1, high)):
+            if child_max_end is not None and child_max_end > max_end:
+                max_end = child_max_end
+
+        self.max_ends[middle] = max_end
+        return max_end
+
+    def overlapping(self, start, end):
+        """ Items of the intervals overlapping [start, end], in start order """
+        items = []
+        self.search(0, len(self.intervals) - 1, start, end, items)
+        return items
+
+    def search(self, low, high, start, end, items):
+        if low > high:
+            return
+
+        middle = (low + high) // 2
+        if self.max_ends[middle] < start:
+            # Every interval of this subtree ends before the range
+            return
+
+        self.search(low, middle - 1, start, end, items)
+
+        interval_start, interval_end, item = self.intervals[middle]
+        if interval_start > end:
+            # This interval and the right subtree start after the range
+            return
+        if interval_end >= start:
+            items.append(item)
+
+        self.search(middle + 1, high, start, end, items)
+
+
+def get_requested_dates(start_date, end_date, days_of_week):
+    dates = set()
+    for day_of_week in days_of_week:
+        dates.update(expand_recurrence(None, 0, 'weekly', 0, 0, int(day_of_week), 0, 0, 0,
+                                       start_date, end_date, start_date, end_date))
+    return sorted(dates)
+
+
+def find_allocation_conflicts(employee, start_date, end_date, no_of_hours, days_of_week, exclude_allocation_id=None):
+    """
+    Days on which booking the employee for no_of_hours on the given weekdays between start_date and
+    end_date would take them beyond their standard hours, with the allocations already booked that day.
+    """
+    allocations = list(Allocation.objects.filter(employee=employee, start_date__lte=end_date, end_date__gte=start_date)
+                       .exclude(id=exclude_allocation_id)
+                       .select_related('project')
+                       .prefetch_related('allocation_detail_allocation'))
+
+    index = IntervalIndex((allocation.start_date, allocation.end_date, allocation) for allocation in allocations)
+    occurrences = {allocation.id: get_allocation_occurrences(allocation, start_date, end_date)
+                   for allocation in allocations}
+
+    conflicts = []
+    for day in get_requested_dates(start_date, end_date, days_of_week):
+        booked = [allocation for allocation in index.overlapping(day, day) if day in occurrences[allocation.id]]
+        allocated_hours = sum(allocation.no_of_hours for allocation in booked)
+
+        if allocated_hours + no_of_hours > employee.standard_hours:
+            conflicts.append({'date': day,
+                              'allocated_hours': allocated_hours,
+                              'requested_hours': no_of_hours,
+                              'standard_hours': employee.standard_hours,
+                              'over_allocated_hours': allocated_hours + no_of_hours - employee.standard_hours,
+                              'allocations': [{'id': allocation.id,
+                                               'project': allocation.project.name,
+                                               'no_of_hours': allocation.no_of_hours} for allocation in booked]})
+
+    return conflicts
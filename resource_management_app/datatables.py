@@ -0,0 +1,182 @@
+from hashlib import md5
+from uuid import uuid4
+from django.core.cache import cache
+from django.db.models import F, Min, Q
+from django.http import JsonResponse
+from .conditional import ConditionalDataTablesMixin
+from .search import search_object_ids
+
+DATATABLES_CACHE_KEY = 'resource_management_app.datatables'
+# Page boundaries remembered per table, sort and search
+MAX_CURSORS = 1000
+
+
+def get_table_generations(models):
+    """ Generation of every given table, changed whenever one of its rows is saved or deleted """
+    keys = {'{}.generation.{}'.format(DATATABLES_CACHE_KEY, model._meta.label_lower): model for model in models}
+    generations = cache.get_many(keys.keys())
+
+    for key in keys:
+        if key not in generations:
+            generations[key] = uuid4().hex
+            cache.set(key, generations[key], None)
+
+    return [generations[key] for key in keys]
+
+
+def clear_table(model):
+    # Counts and cursors of previous generations are never read again and expire on their own
+    cache.set('{}.generation.{}'.format(DATATABLES_CACHE_KEY, model._meta.label_lower), uuid4().hex, None)
+
+
+def is_multi_valued(model, path):
+    """ Whether following the lookup path from the model can match several rows (reverse or many to many) """
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.many_to_many or field.one_to_many:
+            return True
+        if not field.is_relation:
+            return False
+        model = field.related_model
+    return False
+
+
+def is_keyset_column(model, path):
+    """ Whether rows can be paged by the values of the column: a single value per row, never null """
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.null or field.many_to_many or field.one_to_many:
+            return False
+        if not field.is_relation:
+            return True
+        model = field.related_model
+    return True
+
+
+class DataTablesMixin(ConditionalDataTablesMixin):
+    """
+    Server side processing for the DataTables of list views (?datatables=1), declared per view:
+
+    - datatables_columns: lookups of the table's columns, in the order DataTables numbers them
+    - datatables_search: lookups matched by the search box with icontains, or datatables_search_index to
+      search the table's full text index instead, see search.py
+    - datatables_values: fields of the rows, or get_datatables_row() to build them from the objects
+    - datatables_select_related / datatables_prefetch_related: relations the rows read
+
+    recordsTotal is cached until the table is written to. Rows are paged by keyset rather than OFFSET when
+    the sort column has a single, non null value per row: the sort value and id of the last row of every
+    page served are remembered, and the next page starts from the closest one before it.
+    """
+    datatables_columns = ()
+    datatables_search = ()
+    datatables_search_index = False
+    datatables_values = ()
+    datatables_select_related = ()
+    datatables_prefetch_related = ()
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get("datatables"):
+            return JsonResponse(self.get_datatables_response(), safe=False)
+        return super().render_to_response(context, **response_kwargs)
+
+    def get_datatables_models(self):
+        # Tables the rows, their sort and search are read from
+        return [queryset.model for queryset in self.get_validator_querysets()]
+
+    def get_records_total(self, generations):
+        key = '{}.total.{}.{}'.format(DATATABLES_CACHE_KEY, self.model._meta.label_lower, generations[0])
+        records_total = cache.get(key)
+        if records_total is None:
+            records_total = self.get_queryset().count()
+            cache.set(key, records_total)
+        return records_total
+
+    def filter_search(self, queryset, search_value):
+        if self.datatables_search_index:
+            object_ids = search_object_ids(self.model, search_value)
+            return queryset if object_ids is None else queryset.filter(pk__in=object_ids)
+
+        search = Q()
+        for lookup in self.datatables_search:
+            search |= Q(**{'{}__icontains'.format(lookup): search_value})
+
+        if any(is_multi_valued(self.model, lookup) for lookup in self.datatables_search):
+            # Matched in a subquery so that the rows are not repeated by the joins, without DISTINCT
+            return queryset.filter(pk__in=self.model.objects.filter(search).values('pk'))
+        return queryset.filter(search)
+
+    def get_datatables_row(self, obj):
+        raise NotImplementedError
+
+    def get_cursor_key(self, generations, column, descending, search_value):
+        return '{}.cursors.{}'.format(DATATABLES_CACHE_KEY, md5(repr(
+            (self.model._meta.label_lower, generations, column, descending, search_value)).encode()).hexdigest())
+
+    def get_datatables_response(self):
+        draw = int(self.request.GET.get("draw", "1"))
+        start = int(self.request.GET.get("start", "0"))
+        length = int(self.request.GET.get("length", "10"))
+        order_column_index = int(self.request.GET.get('order[0][column]', 0))
+        descending = self.request.GET.get('order[0][dir]', 'asc') == 'desc'
+        search_value = self.request.GET.get("search[value]", None)
+
+        # Columns without data (e.g. the edit and delete links) sort by the first one
+        if order_column_index >= len(self.datatables_columns):
+            order_column_index = 0
+        column = self.datatables_columns[order_column_index]
+        generations = get_table_generations(self.get_datatables_models())
+        records_total = self.get_records_total(generations)
+
+        qs = self.get_queryset()
+        if search_value:
+            qs = self.filter_search(qs, search_value)
+        records_filtered = qs.count() if search_value else records_total
+
+        # Rows with the same sort value are ordered by id, so that pages neither overlap nor skip rows
+        if is_multi_valued(self.model, column):
+            qs = qs.annotate(datatables_key=Min(column))
+        else:
+            qs = qs.annotate(datatables_key=F(column))
+        sign = '-' if descending else ''
+        qs = qs.order_by(f'{sign}datatables_key', f'{sign}pk')
+
+        keyset = length > 0 and is_keyset_column(self.model, column)
+        cursors = {}
+        if keyset:
+            cursor_key = self.get_cursor_key(generations, column, descending, search_value)
+            cursors = cache.get(cursor_key, {})
+            row_number = max((row_number for row_number in cursors if row_number <= start), default=0)
+            if row_number:
+                key, pk = cursors[row_number]
+                if descending:
+                    qs = qs.filter(Q(datatables_key__lt=key) | Q(datatables_key=key, pk__lt=pk))
+                else:
+                    qs = qs.filter(Q(datatables_key__gt=key) | Q(datatables_key=key, pk__gt=pk))
+                start -= row_number
+                row_number += start
+            else:
+                row_number = start
+
+        if length > 0:
+            qs = qs[start: start + length]
+
+        if self.datatables_values:
+            rows = list(qs.values(*self.datatables_values, 'datatables_key'))
+            keys = [(row.pop('datatables_key'), row['id']) for row in rows]
+        else:
+            objects = list(qs.select_related(*self.datatables_select_related)
+                           .prefetch_related(*self.datatables_prefetch_related))
+            rows = [self.get_datatables_row(obj) for obj in objects]
+            keys = [(obj.datatables_key, obj.pk) for obj in objects]
+
+        if keyset and len(rows) == length and len(cursors) < MAX_CURSORS \
+                and cursors.get(row_number + length) != keys[-1]:
+            cursors[row_number + length] = keys[-1]
+            cache.set(cursor_key, cursors)
+
+        return {
+            "recordsTotal": records_total,
+            "recordsFiltered": records_filtered,
+            "draw": draw,
+            "data": rows,
+        }
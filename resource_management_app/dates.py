@@ -0,0 +1,111 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.db.models import Q, Case, When, Exists, OuterRef, BooleanField
+from .models import BankHoliday, DimDate, DimDateLocation
+from .holidays import get_bank_holidays
+
+# Days of week (Monday is 0) that are not worked, per location. Can be overridden with the
+# RESOURCE_MANAGEMENT_WEEKEND_DAYS setting
+DEFAULT_WEEKEND_DAYS = (5, 6)
+
+DIM_DATE_START = date(2000, 1, 1)
+DIM_DATE_END = date(2100, 12, 31)
+
+
+def get_weekend_days(location):
+    weekend_days = getattr(settings, 'RESOURCE_MANAGEMENT_WEEKEND_DAYS', {})
+    return weekend_days.get(location, DEFAULT_WEEKEND_DAYS)
+
+
+def get_locations():
+    return [location for location, name in DimDateLocation.LOCATION]
+
+
+def date_range(start_date, end_date):
+    return [start_date + timedelta(days=day) for day in range((end_date - start_date).days + 1)]
+
+
+def build_dim_date(day):
+    iso_year, iso_week, iso_day = day.isocalendar()
+
+    return DimDate(date=day,
+                   day_of_week=day.weekday(),
+                   day_name=day.strftime("%A"),
+                   week_commencing=day - timedelta(days=day.weekday()),
+                   iso_year=iso_year,
+                   iso_week=iso_week,
+                   month_start=day.replace(day=1),
+                   month_name=day.strftime("%b"),
+                   quarter=(day.month - 1) // 3 + 1,
+                   year=day.year)
+
+
+def build_dim_date_locations(day, bank_holidays):
+    dim_date_locations = []
+
+    for location in get_locations():
+        is_weekend = day.weekday() in get_weekend_days(location)
+        is_bank_holiday = day in bank_holidays.get(location, set())
+        dim_date_locations.append(DimDateLocation(date=day,
+                                                  location=location,
+                                                  is_weekend=is_weekend,
+                                                  is_bank_holiday=is_bank_holiday,
+                                                  is_working_day=not is_weekend and not is_bank_holiday))
+    return dim_date_locations
+
+
+def get_dim_dates(start_date, end_date):
+    """
+    DimDate rows between the given dates in date order. Falls back to building them in memory when
+    the dimension table has not been populated for the whole range.
+    """
+    dim_dates = list(DimDate.objects.filter(date__range=(start_date, end_date)).order_by('date'))
+
+    if len(dim_dates) != (end_date - start_date).days + 1:
+        dim_dates = [build_dim_date(day) for day in date_range(start_date, end_date)]
+
+    return dim_dates
+
+
+def get_location_calendar(start_date, end_date):
+    """
+    Working day and bank holiday flags between the given dates, e.g.
+    ({'uk': [True, True, ...]}, {'uk': [False, False, ...]}), one entry per day for every location.
+    """
+    no_of_days = (end_date - start_date).days + 1
+    working_days = {}
+    bank_holidays = {}
+
+    rows = DimDateLocation.objects.filter(date__range=(start_date, end_date))\
+        .order_by('location', 'date')\
+        .values_list('location', 'is_working_day', 'is_bank_holiday')
+
+    for location, is_working_day, is_bank_holiday in rows:
+        working_days.setdefault(location, []).append(is_working_day)
+        bank_holidays.setdefault(location, []).append(is_bank_holiday)
+
+    if any(len(days) != no_of_days for days in working_days.values()) or \
+            set(working_days.keys()) != set(get_locations()):
+        # Dimension table not populated for the range
+        working_days = {}
+        bank_holidays = {}
+        location_holidays = get_bank_holidays()
+        for day in date_range(start_date, end_date):
+            for dim_date_location in build_dim_date_locations(day, location_holidays):
+                working_days.setdefault(dim_date_location.location, []).append(dim_date_location.is_working_day)
+                bank_holidays.setdefault(dim_date_location.location, []).append(dim_date_location.is_bank_holiday)
+
+    return working_days, bank_holidays
+
+
+def refresh_dim_date_bank_holidays(dates):
+    """
+    Recompute bank holiday and working day flags for the given dates and for every date currently
+    flagged as a bank holiday, which covers holidays that were moved or deleted.
+    """
+    holidays = BankHoliday.objects.filter(date=OuterRef('date'), location=OuterRef('location'), is_deleted=False)
+
+    DimDateLocation.objects.filter(Q(is_bank_holiday=True) | Q(date__in=dates))\
+        .update(is_bank_holiday=Exists(holidays),
+                is_working_day=Case(When(is_weekend=False, then=~Exists(holidays)),
+                                    default=False, output_field=BooleanField()))
@@ -6,6 +6,7 @@ from .models import (Department, AccountManager, Customer, ProjectType,
 from django.core import validators
 from django.utils.translation import gettext_lazy as _
 from django.forms.models import inlineformset_factory
+from .conflicts import find_allocation_conflicts
 
 
 class DepartmentForm(ModelForm):
@@ -321,6 +322,7 @@ class AllocationForm(ModelForm):
         ('5', 'Saturday'),
         ('6', 'Sunday'),
     ), widget=forms.CheckboxSelectMultiple)
+    allow_over_allocation = forms.BooleanField(required=False, label=_('Allow over allocation'))
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -329,6 +331,34 @@ class AllocationForm(ModelForm):
         initial = super().get_initial()
         return initial
 
+    def clean(self):
+        cleaned_data = super().clean()
+        employee = cleaned_data.get('employee')
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        no_of_hours = cleaned_data.get('no_of_hours')
+        days_of_week = cleaned_data.get('days_of_week')
+
+        if None in (employee, start_date, end_date, no_of_hours) or not days_of_week:
+            return cleaned_data
+
+        if not cleaned_data.get('allow_over_allocation'):
+            conflicts = find_allocation_conflicts(employee, start_date, end_date, no_of_hours, days_of_week,
+                                                  exclude_allocation_id=self.instance.pk)
+            if conflicts:
+                dates = ', '.join(conflict['date'].strftime('%d/%m/%Y') for conflict in conflicts[:5])
+                if len(conflicts) > 5:
+                    dates += ' and %d more' % (len(conflicts) - 5)
+                raise forms.ValidationError(
+                    _('%(employee)s would be over allocated by %(hours)s hour(s) on %(count)s day(s): %(dates)s. '
+                      'Tick "Allow over allocation" to save anyway.'),
+                    params={'employee': employee,
+                            'hours': sum(conflict['over_allocated_hours'] for conflict in conflicts),
+                            'count': len(conflicts),
+                            'dates': dates})
+
+        return cleaned_data
+
     class Meta:
         model = Allocation
         fields = ['employee', 'project', 'allocation_type', 'start_date', 'end_date', 'no_of_hours', 'days_of_week']
@@ -0,0 +1,22 @@
+from django.core.cache import cache
+from .models import BankHoliday
+
+BANK_HOLIDAYS_CACHE_KEY = 'resource_management_app.bank_holidays'
+
+
+def get_bank_holidays():
+    """ Bank holiday dates grouped by location, e.g. {'uk': {date(2023, 12, 25), ...}} """
+    bank_holidays = cache.get(BANK_HOLIDAYS_CACHE_KEY)
+
+    if bank_holidays is None:
+        bank_holidays = {}
+        for location, date in BankHoliday.objects.filter(is_deleted=False).values_list('location', 'date'):
+            bank_holidays.setdefault(location, set()).add(date)
+        # Kept until a BankHoliday is saved or deleted, see signals.py
+        cache.set(BANK_HOLIDAYS_CACHE_KEY, bank_holidays, None)
+
+    return bank_holidays
+
+
+def clear_bank_holidays():
+    cache.delete(BANK_HOLIDAYS_CACHE_KEY)
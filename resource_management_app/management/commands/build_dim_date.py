@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from dateutil import parser
+from resource_management_app.models import DimDate, DimDateLocation
+from resource_management_app.holidays import get_bank_holidays
+from resource_management_app.dates import (DIM_DATE_START, DIM_DATE_END, date_range, build_dim_date,
+                                           build_dim_date_locations)
+
+
+class Command(BaseCommand):
+    help = 'Populate the DimDate calendar table and its per-location working day flags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', default=str(DIM_DATE_START))
+        parser.add_argument('--end-date', default=str(DIM_DATE_END))
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start_date = parser.parse(options['start_date']).date()
+        end_date = parser.parse(options['end_date']).date()
+        batch_size = options['batch_size']
+
+        bank_holidays = get_bank_holidays()
+        days = date_range(start_date, end_date)
+
+        with transaction.atomic():
+            DimDate.objects.filter(date__range=(start_date, end_date)).delete()
+            DimDateLocation.objects.filter(date__range=(start_date, end_date)).delete()
+
+            DimDate.objects.bulk_create([build_dim_date(day) for day in days], batch_size=batch_size)
+            DimDateLocation.objects.bulk_create(
+                [dim_date_location for day in days for dim_date_location in build_dim_date_locations(day, bank_holidays)],
+                batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS('Populated {} dates from {} to {}'.format(len(days), start_date, end_date)))
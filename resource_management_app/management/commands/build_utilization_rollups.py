@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from dateutil import parser
+from resource_management_app.models import Employee
+from resource_management_app.rollups import refresh_utilization_rollups
+
+
+class Command(BaseCommand):
+    help = 'Build the weekly, monthly and quarterly utilization rollups of every employee for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', required=True)
+        parser.add_argument('--end-date', required=True)
+
+    def handle(self, *args, **options):
+        start_date = parser.parse(options['start_date']).date()
+        end_date = parser.parse(options['end_date']).date()
+
+        employee_ids = list(Employee.objects.values_list('id', flat=True))
+        refresh_utilization_rollups(employee_ids, start_date, end_date)
+
+        self.stdout.write(self.style.SUCCESS('Built utilization rollups of {} employees from {} to {}'.format(
+            len(employee_ids), start_date, end_date)))
@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from dateutil import parser
+from resource_management_app.models import Allocation, Employee, Project, UtilizationRollup
+from resource_management_app.utils import TimeLineCalendar
+from resource_management_app.capacity import CapacityMatrix
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the timeline and capacity calendar queries and report the indexes they use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', default=str(date.today()))
+        parser.add_argument('--end-date', default=str(date.today() + timedelta(weeks=26)))
+        parser.add_argument('--show-plan', action='store_true', help='Print the full query plans')
+
+    def get_queries(self, start_date, end_date):
+        cal = TimeLineCalendar(start_date, end_date)
+        employee = Employee.objects.order_by('id').first()
+        project = Project.objects.order_by('id').first()
+
+        queries = [
+            ('Timeline projects', cal.get_project_queryset()),
+            ('Timeline allocations', cal.get_allocation_queryset()),
+            ('Flex squad employees', cal.get_flex_squad_queryset()),
+            ('Capacity hours', CapacityMatrix(*cal.get_capacity_weeks(),
+                                              cal.get_capacity_employee_queryset()).get_hours_queryset()),
+            ('Utilization rollups', UtilizationRollup.objects.filter(
+                grain='week', period_start__range=(start_date, end_date))),
+        ]
+        if employee is not None:
+            queries.append(('Employee allocations', Allocation.objects.filter(
+                employee=employee, end_date__gte=start_date, start_date__lte=end_date)))
+        if project is not None:
+            queries.append(('Project allocations', Allocation.objects.filter(
+                project=project, end_date__gte=start_date, start_date__lte=end_date)))
+        return queries
+
+    @staticmethod
+    def get_index_names():
+        index_names = set()
+        with connection.cursor() as cursor:
+            for table in connection.introspection.table_names(cursor):
+                for name, constraint in connection.introspection.get_constraints(cursor, table).items():
+                    if constraint['index'] or constraint['unique'] or constraint['primary_key']:
+                        index_names.add(name)
+        return index_names
+
+    def handle(self, *args, **options):
+        start_date = parser.parse(options['start_date']).date()
+        end_date = parser.parse(options['end_date']).date()
+        index_names = self.get_index_names()
+
+        for name, queryset in self.get_queries(start_date, end_date):
+            plan = queryset.explain()
+            used_indexes = sorted(index for index in index_names if index in plan)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            if used_indexes:
+                self.stdout.write('  Indexes used: {}'.format(', '.join(used_indexes)))
+            else:
+                self.stdout.write(self.style.WARNING('  No index used'))
+            if options['show_plan']:
+                self.stdout.write('  ' + plan.replace('\n', '\n  '))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from resource_management_app.allocation_days import rebuild_allocation_days
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized AllocationDay table from Allocation and AllocationDetail'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_allocation_days(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt {} allocation days'.format(count)))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from resource_management_app.models import SearchDocument
+from resource_management_app.search import SEARCH_FIELDS, get_label, refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search documents of the employees, projects, customers and account managers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        for model in SEARCH_FIELDS:
+            ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+            SearchDocument.objects.filter(label=get_label(model)).exclude(object_id__in=model.objects.values('pk')).delete()
+            for start in range(0, len(ids), batch_size):
+                refresh_search_documents(model, ids[start:start + batch_size])
+
+            self.stdout.write('Indexed {} {}'.format(len(ids), model._meta.verbose_name_plural))
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt the search index'))
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.1 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resource_management_app', '0007_rename_holiday_bankholiday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DimDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('day_of_week', models.IntegerField()),
+                ('day_name', models.CharField(max_length=10)),
+                ('week_commencing', models.DateField(db_index=True)),
+                ('iso_year', models.IntegerField()),
+                ('iso_week', models.IntegerField()),
+                ('month_start', models.DateField(db_index=True)),
+                ('month_name', models.CharField(max_length=3)),
+                ('quarter', models.IntegerField()),
+                ('year', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DimDateLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('location', models.CharField(choices=[('india', 'India'), ('uk', 'UK'), ('other', 'OTHER')], max_length=10)),
+                ('is_weekend', models.BooleanField(default=False)),
+                ('is_bank_holiday', models.BooleanField(default=False)),
+                ('is_working_day', models.BooleanField(default=True)),
+            ],
+            options={
+                'unique_together': {('location', 'date')},
+            },
+        ),
+    ]
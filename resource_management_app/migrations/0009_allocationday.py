@@ -0,0 +1,50 @@
+# Generated by Django 4.2.1 on 2026-10-18 07:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from resource_management_app.recurrence import get_allocation_occurrences
+
+
+def populate_allocation_days(apps, schema_editor):
+    Allocation = apps.get_model('resource_management_app', 'Allocation')
+    AllocationDay = apps.get_model('resource_management_app', 'AllocationDay')
+
+    # Expanded by the recurrence engine like the rebuild_allocation_days command, daily and monthly details
+    # included
+    allocation_days = []
+    for allocation in Allocation.objects.exclude(end_date=None).prefetch_related('allocation_detail_allocation'):
+        for day in sorted(get_allocation_occurrences(allocation, allocation.start_date, allocation.end_date)):
+            allocation_days.append(AllocationDay(allocation_id=allocation.id,
+                                                 employee_id=allocation.employee_id,
+                                                 project_id=allocation.project_id,
+                                                 allocation_type_id=allocation.allocation_type_id,
+                                                 date=day,
+                                                 hours=allocation.no_of_hours))
+
+    AllocationDay.objects.bulk_create(allocation_days, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resource_management_app', '0008_dimdate_dimdatelocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllocationDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hours', models.IntegerField()),
+                ('allocation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocation_days', to='resource_management_app.allocation')),
+                ('allocation_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocation_days', to='resource_management_app.allocationtype')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocation_days', to='resource_management_app.employee')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocation_days', to='resource_management_app.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'date'], name='resource_ma_employe_a4c0f8_idx'), models.Index(fields=['date', 'project'], name='resource_ma_date_456f6f_idx')],
+            },
+        ),
+        migrations.RunPython(populate_allocation_days, migrations.RunPython.noop),
+    ]
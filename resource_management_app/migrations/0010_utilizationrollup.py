@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-18 07:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resource_management_app', '0009_allocationday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UtilizationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('week', 'Week'), ('month', 'Month'), ('quarter', 'Quarter')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('allocated_hours', models.IntegerField(default=0)),
+                ('available_hours', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utilization_rollups', to='resource_management_app.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['grain', 'period_start'], name='resource_ma_grain_3ff744_idx')],
+                'unique_together': {('employee', 'grain', 'period_start')},
+            },
+        ),
+    ]
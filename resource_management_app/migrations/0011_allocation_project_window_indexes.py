@@ -0,0 +1,31 @@
+# Generated by Django 4.2.1 on 2026-10-18 07:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resource_management_app', '0010_utilizationrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='allocation',
+            index=models.Index(fields=['employee', 'start_date', 'end_date'], name='resource_ma_employe_aac4b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='allocation',
+            index=models.Index(fields=['project', 'start_date', 'end_date'], name='resource_ma_project_2dd553_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='allocation',
+            index=models.Index(fields=['start_date', 'end_date'], name='resource_ma_start_d_f39685_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['start_date', 'end_date'], name='resource_ma_start_d_d307d6_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.1 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE resource_management_app_searchdocument_fts USING fts5("
+    "document, content='resource_management_app_searchdocument', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER resource_management_app_searchdocument_ai AFTER INSERT ON resource_management_app_searchdocument "
+    "BEGIN INSERT INTO resource_management_app_searchdocument_fts(rowid, document) VALUES (new.id, new.document); END",
+    "CREATE TRIGGER resource_management_app_searchdocument_ad AFTER DELETE ON resource_management_app_searchdocument "
+    "BEGIN INSERT INTO resource_management_app_searchdocument_fts(resource_management_app_searchdocument_fts, rowid, "
+    "document) VALUES ('delete', old.id, old.document); END",
+    "CREATE TRIGGER resource_management_app_searchdocument_au AFTER UPDATE ON resource_management_app_searchdocument "
+    "BEGIN INSERT INTO resource_management_app_searchdocument_fts(resource_management_app_searchdocument_fts, rowid, "
+    "document) VALUES ('delete', old.id, old.document); "
+    "INSERT INTO resource_management_app_searchdocument_fts(rowid, document) VALUES (new.id, new.document); END",
+]
+SQLITE_DROP_INDEX = [
+    "DROP TRIGGER resource_management_app_searchdocument_au",
+    "DROP TRIGGER resource_management_app_searchdocument_ad",
+    "DROP TRIGGER resource_management_app_searchdocument_ai",
+    "DROP TABLE resource_management_app_searchdocument_fts",
+]
+MYSQL_INDEX = [
+    "ALTER TABLE resource_management_app_searchdocument "
+    "ADD FULLTEXT INDEX resource_management_app_searchdocument_ft (document)",
+]
+MYSQL_DROP_INDEX = [
+    "ALTER TABLE resource_management_app_searchdocument DROP INDEX resource_management_app_searchdocument_ft",
+]
+
+
+# Columns of the documents as of this migration, see search.SEARCH_FIELDS
+SEARCH_FIELDS = {
+    'Employee': ['emp_id', 'first_name', 'last_name', 'job_title__name', 'line_manager__first_name', 'skills__name'],
+    'Project': ['name', 'start_date', 'end_date', 'customer__name', 'project_type__name',
+                'customer_delivery_lead__first_name', 'service_delivery_manager__first_name'],
+    'Customer': ['name', 'description', 'account_manager__first_name'],
+    'AccountManager': ['first_name', 'last_name', 'email', 'phone'],
+}
+
+
+def populate_search_documents(apps, schema_editor):
+    SearchDocument = apps.get_model('resource_management_app', 'SearchDocument')
+
+    search_documents = []
+    for model_name, lookups in SEARCH_FIELDS.items():
+        model = apps.get_model('resource_management_app', model_name)
+        documents = {}
+        for row in model.objects.order_by('pk').values_list('pk', *lookups):
+            values = documents.setdefault(row[0], {})
+            for value in row[1:]:
+                if value is not None and value != '':
+                    values[str(value)] = None
+
+        search_documents += [SearchDocument(label=model._meta.label_lower, object_id=pk, document=' '.join(values))
+                             for pk, values in documents.items()]
+
+    SearchDocument.objects.bulk_create(search_documents, batch_size=1000)
+
+
+def run_for_vendor(statements):
+    """ Full text index of the search documents: FTS5 on SQLite, FULLTEXT on MySQL, none elsewhere """
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resource_management_app', '0011_allocation_project_window_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('document', models.TextField()),
+            ],
+            options={
+                'unique_together': {('label', 'object_id')},
+            },
+        ),
+        migrations.RunPython(run_for_vendor({'sqlite': SQLITE_INDEX, 'mysql': MYSQL_INDEX}),
+                             run_for_vendor({'sqlite': SQLITE_DROP_INDEX, 'mysql': MYSQL_DROP_INDEX})),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -196,6 +196,12 @@ class Project(ResourceManagementAbstract):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_by_project')
     updated_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='updated_by_project')
 
+    class Meta:
+        indexes = [
+            # Window overlap filters (start_date <= y AND end_date >= x) of the timeline calendar
+            models.Index(fields=['start_date', 'end_date']),
+        ]
+
     def get_absolute_url(self):
         return reverse('project-list')
 
@@ -247,6 +253,14 @@ class Allocation(ResourceManagementAbstract):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_by_allocation')
     updated_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='updated_by_allocation')
 
+    class Meta:
+        indexes = [
+            # Window overlap filters of the calendars, per employee, per project and across everyone
+            models.Index(fields=['employee', 'start_date', 'end_date']),
+            models.Index(fields=['project', 'start_date', 'end_date']),
+            models.Index(fields=['start_date', 'end_date']),
+        ]
+
     def get_absolute_url(self):
         return reverse('allocation-list')
 
@@ -281,3 +295,87 @@ class AllocationDetail(ResourceManagementAbstract):
             self.allocation.allocation_type.name,
             self.allocation.project.name,
             calendar.day_name[self.day_of_week])
+
+
+class DimDate(models.Model):
+    """ Calendar dimension, one row per date, populated by the build_dim_date management command """
+    date = models.DateField(unique=True)
+    day_of_week = models.IntegerField()
+    day_name = models.CharField(max_length=10)
+    week_commencing = models.DateField(db_index=True)
+    iso_year = models.IntegerField()
+    iso_week = models.IntegerField()
+    month_start = models.DateField(db_index=True)
+    month_name = models.CharField(max_length=3)
+    quarter = models.IntegerField()
+    year = models.IntegerField()
+
+    def __str__(self):
+        return str(self.date)
+
+
+class DimDateLocation(models.Model):
+    """ Working day and bank holiday flags of a DimDate for one location """
+    LOCATION = BankHoliday.LOCATION
+    date = models.DateField()
+    location = models.CharField(choices=LOCATION, max_length=10)
+    is_weekend = models.BooleanField(default=False)
+    is_bank_holiday = models.BooleanField(default=False)
+    is_working_day = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ('location', 'date')
+
+    def __str__(self):
+        return '{} ({})'.format(self.date, self.location)
+
+
+class AllocationDay(models.Model):
+    """ One row per allocated day of an Allocation, kept in sync by signals.py """
+    allocation = models.ForeignKey(Allocation, on_delete=models.CASCADE, related_name='allocation_days')
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='allocation_days')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='allocation_days')
+    allocation_type = models.ForeignKey(AllocationType, on_delete=models.CASCADE, related_name='allocation_days')
+    date = models.DateField()
+    hours = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'date']),
+            models.Index(fields=['date', 'project']),
+        ]
+
+    def __str__(self):
+        return '({}) {} hour(s) on {}'.format(self.allocation_id, self.hours, self.date)
+
+
+class UtilizationRollup(models.Model):
+    """ Allocated and available hours of an employee per week, month or quarter, see rollups.py """
+    GRAIN = (('week', 'Week'), ('month', 'Month'), ('quarter', 'Quarter'))
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='utilization_rollups')
+    grain = models.CharField(choices=GRAIN, max_length=10)
+    period_start = models.DateField()
+    allocated_hours = models.IntegerField(default=0)
+    available_hours = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('employee', 'grain', 'period_start')
+        indexes = [
+            models.Index(fields=['grain', 'period_start']),
+        ]
+
+    def __str__(self):
+        return '{} {} of {}'.format(self.employee_id, self.grain, self.period_start)
+
+
+class SearchDocument(models.Model):
+    """ Searchable text of a row of an indexed table, kept in sync by signals.py, see search.py """
+    label = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    document = models.TextField()
+
+    class Meta:
+        unique_together = ('label', 'object_id')
+
+    def __str__(self):
+        return '{} {}'.format(self.label, self.object_id)
@@ -0,0 +1,113 @@
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+
+
+def get_occurrences(detail, start_date, end_date, allocation=None):
+    """
+    Dates between start_date and end_date on which an AllocationDetail recurs, within the dates of its
+    allocation. Understands daily, weekly and monthly recurrences with seperation_count (0 means every
+    day/week/month, 1 every other one...) and max_num_of_accurrences (0 means unlimited).
+    """
+    allocation = allocation or detail.allocation
+    if allocation.end_date is None:
+        return ()
+
+    return expand_recurrence(detail.id, detail.version, detail.reccurring_type, detail.seperation_count or 0,
+                             detail.max_num_of_accurrences or 0, detail.day_of_week or 0,
+                             detail.week_of_month or 0, detail.day_of_month or 0, detail.month_of_year or 0,
+                             allocation.start_date, allocation.end_date, start_date, end_date)
+
+
+def get_allocation_occurrences(allocation, start_date, end_date):
+    """ Union of the occurrences of every AllocationDetail of the allocation, as a set """
+    occurrences = set()
+    for detail in allocation.allocation_detail_allocation.all():
+        occurrences.update(get_occurrences(detail, start_date, end_date, allocation))
+    return occurrences
+
+
+@lru_cache(maxsize=8192)
+def expand_recurrence(detail_id, version, reccurring_type, seperation_count, max_num_of_accurrences, day_of_week,
+                      week_of_month, day_of_month, month_of_year, series_start, series_end, window_start, window_end):
+    """
+    Memoized expansion. Besides the detail id, version and window the key holds every field the expansion
+    depends on, so a rule or allocation edited without bumping its version is never served stale.
+    """
+    first_day = max(series_start, window_start)
+    last_day = min(series_end, window_end)
+    if first_day > last_day:
+        return ()
+
+    interval = seperation_count + 1
+
+    if reccurring_type == 'monthly':
+        return expand_monthly(interval, max_num_of_accurrences, day_of_week, week_of_month, day_of_month,
+                              month_of_year, series_start, first_day, last_day)
+
+    if reccurring_type == 'daily':
+        step = interval
+        anchor = series_start
+    else:
+        step = interval * 7
+        anchor = series_start + timedelta(days=(day_of_week - series_start.weekday()) % 7)
+
+    # Jump straight to the first occurrence inside the window
+    index = max(0, -(-(first_day - anchor).days // step))
+    occurrences = []
+    day = anchor + timedelta(days=index * step)
+    while day <= last_day and (not max_num_of_accurrences or index < max_num_of_accurrences):
+        occurrences.append(day)
+        index += 1
+        day += timedelta(days=step)
+
+    return tuple(occurrences)
+
+
+def get_monthly_date(year, month, day_of_week, week_of_month, day_of_month):
+    """ Date of a monthly occurrence, None when the month has no such day (e.g. a 5th Monday) """
+    month_length = calendar.monthrange(year, month)[1]
+
+    if week_of_month:
+        if week_of_month < 0:
+            # Last given weekday of the month
+            last_date = date(year, month, month_length)
+            return last_date - timedelta(days=(last_date.weekday() - day_of_week) % 7)
+
+        day = 1 + (day_of_week - date(year, month, 1).weekday()) % 7 + (week_of_month - 1) * 7
+        return date(year, month, day) if day <= month_length else None
+
+    # Days missing from short months fall on the last day of the month
+    return date(year, month, min(day_of_month, month_length))
+
+
+def expand_monthly(interval, max_num_of_accurrences, day_of_week, week_of_month, day_of_month, month_of_year,
+                   series_start, first_day, last_day):
+    if not week_of_month and not day_of_month:
+        day_of_month = series_start.day
+
+    step = interval * 12 if month_of_year else interval
+    anchor = series_start.year * 12 + series_start.month - 1
+    if month_of_year:
+        anchor += (month_of_year - series_start.month) % 12
+
+    if max_num_of_accurrences:
+        # Occurrences are counted from the start of the series
+        month = anchor
+    else:
+        # Jump straight to the first month inside the window
+        month = anchor + max(0, -(-(first_day.year * 12 + first_day.month - 1 - anchor) // step)) * step
+
+    occurrences = []
+    count = 0
+    while month // 12 <= last_day.year and (not max_num_of_accurrences or count < max_num_of_accurrences):
+        day = get_monthly_date(month // 12, month % 12 + 1, day_of_week, week_of_month, day_of_month)
+        if day is not None and day >= series_start:
+            if day > last_day:
+                break
+            count += 1
+            if day >= first_day:
+                occurrences.append(day)
+        month += step
+
+    return tuple(occurrences)
@@ -0,0 +1,134 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Min, Max
+from .models import Employee, UtilizationRollup
+from .capacity import CapacityMatrix
+from .dates import get_location_calendar
+
+# Coarsest grain first
+GRAINS = ('quarter', 'month', 'week')
+
+
+def get_period_start(day, grain):
+    if grain == 'week':
+        return day - timedelta(days=day.weekday())
+    elif grain == 'month':
+        return day.replace(day=1)
+    else:
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+
+
+def get_next_period_start(day, grain):
+    period_start = get_period_start(day, grain)
+    if grain == 'week':
+        return period_start + timedelta(weeks=1)
+
+    months = 1 if grain == 'month' else 3
+    month = period_start.month - 1 + months
+    return period_start.replace(year=period_start.year + month // 12, month=month % 12 + 1)
+
+
+def get_period_end(day, grain):
+    return get_next_period_start(day, grain) - timedelta(days=1)
+
+
+def get_period_starts(start_date, end_date, grain):
+    period_starts = []
+    period_start = get_period_start(start_date, grain)
+    while period_start <= end_date:
+        period_starts.append(period_start)
+        period_start = get_next_period_start(period_start, grain)
+    return period_starts
+
+
+def choose_grain(start_date, end_date):
+    """ Coarsest grain whose periods exactly cover the range, weeks otherwise """
+    for grain in GRAINS:
+        if get_period_start(start_date, grain) == start_date and get_period_end(end_date, grain) == end_date:
+            return grain
+    return 'week'
+
+
+def refresh_utilization_rollups(employee_ids, start_date, end_date, grains=GRAINS):
+    """ Recompute the rollups of the given grains for the employees and the periods touching the range """
+    employees = list(Employee.objects.filter(id__in=employee_ids).order_by('id'))
+    if not employees:
+        return
+
+    # Whole periods of every grain touching the range
+    first_day = min(get_period_start(start_date, grain) for grain in grains)
+    last_day = max(get_period_end(end_date, grain) for grain in grains)
+    no_of_weeks = (last_day - first_day).days // 7 + 1
+
+    working_days, bank_holidays = get_location_calendar(first_day, first_day + timedelta(weeks=no_of_weeks, days=-1))
+    capacity = CapacityMatrix(first_day, no_of_weeks, employees, working_days, bank_holidays).load_allocations()
+
+    rollups = []
+    with transaction.atomic():
+        for grain in grains:
+            period_starts = get_period_starts(start_date, end_date, grain)
+            hours, available = capacity.get_period_totals(period_starts, get_period_end(end_date, grain))
+
+            UtilizationRollup.objects.filter(employee_id__in=[employee.id for employee in employees], grain=grain,
+                                             period_start__range=(period_starts[0], period_starts[-1])).delete()
+
+            for index, employee in enumerate(capacity.employees):
+                for period, period_start in enumerate(period_starts):
+                    rollups.append(UtilizationRollup(employee_id=employee.id,
+                                                     grain=grain,
+                                                     period_start=period_start,
+                                                     allocated_hours=int(hours[index, period]),
+                                                     available_hours=int(available[index, period])))
+
+        UtilizationRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+def refresh_employee_utilization_rollups(employee_id):
+    """ Recompute every rollup of an employee, e.g. after standard hours or location changed """
+    period_range = UtilizationRollup.objects.filter(employee_id=employee_id)\
+        .aggregate(first_period=Min('period_start'), last_period=Max('period_start'))
+
+    if period_range['first_period'] is not None:
+        refresh_utilization_rollups([employee_id], period_range['first_period'], period_range['last_period'])
+
+
+def get_utilization_rollups(start_date, end_date, grain=None):
+    """
+    Allocated and available hours per employee per period, read from the rollup table. The periods of the
+    grain missing from the table are computed and stored first, only for the employees lacking them: rollups
+    of every period are better built ahead with the build_utilization_rollups command.
+    """
+    if grain not in GRAINS:
+        grain = choose_grain(start_date, end_date)
+    period_starts = get_period_starts(start_date, end_date, grain)
+    employees = list(Employee.objects.select_related('job_title').order_by('id'))
+
+    rollups = UtilizationRollup.objects.filter(grain=grain, period_start__range=(period_starts[0], period_starts[-1]))
+    counts = dict(rollups.values_list('employee_id').annotate(Count('id')))
+    missing_ids = [employee.id for employee in employees if counts.get(employee.id, 0) < len(period_starts)]
+    if missing_ids:
+        refresh_utilization_rollups(missing_ids, start_date, end_date, [grain])
+
+    period_index = {period_start: index for index, period_start in enumerate(period_starts)}
+    employee_rollups = {employee.id: {'allocated_hours': [0] * len(period_starts),
+                                      'available_hours': [0] * len(period_starts)} for employee in employees}
+
+    for employee_id, period_start, allocated_hours, available_hours in \
+            rollups.values_list('employee_id', 'period_start', 'allocated_hours', 'available_hours'):
+        if employee_id in employee_rollups:
+            employee_rollups[employee_id]['allocated_hours'][period_index[period_start]] = allocated_hours
+            employee_rollups[employee_id]['available_hours'][period_index[period_start]] = available_hours
+
+    data = []
+    for employee in employees:
+        allocated_hours = employee_rollups[employee.id]['allocated_hours']
+        available_hours = employee_rollups[employee.id]['available_hours']
+        data.append({'id': employee.id,
+                     'first_name': employee.first_name,
+                     'job_title': employee.job_title.name if employee.job_title else None,
+                     'allocated_hours': allocated_hours,
+                     'available_hours': available_hours,
+                     'utilization': [round(hours * 100 / available) if available else 0
+                                     for hours, available in zip(allocated_hours, available_hours)]})
+
+    return {'grain': grain, 'periods': period_starts, 'employees': data}
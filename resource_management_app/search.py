@@ -0,0 +1,122 @@
+import re
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from .models import AccountManager, Customer, Employee, Project, SearchDocument
+
+# Lookups whose values make up the search document of each indexed table
+SEARCH_FIELDS = {
+    Employee: ['emp_id', 'first_name', 'last_name', 'job_title__name', 'line_manager__first_name', 'skills__name'],
+    Project: ['name', 'start_date', 'end_date', 'customer__name', 'project_type__name',
+              'customer_delivery_lead__first_name', 'service_delivery_manager__first_name'],
+    Customer: ['name', 'description', 'account_manager__first_name'],
+    AccountManager: ['first_name', 'last_name', 'email', 'phone'],
+}
+# FTS5 index of the documents on SQLite, see migration 0012
+FTS_TABLE = 'resource_management_app_searchdocument_fts'
+# Words the InnoDB full text index leaves out, by default: shorter than innodb_ft_min_token_size or stopwords
+MYSQL_MIN_TOKEN_SIZE = 3
+MYSQL_STOPWORDS = {'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i',
+                   'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when',
+                   'where', 'who', 'will', 'with', 'und', 'www'}
+
+
+def get_label(model):
+    return model._meta.label_lower
+
+
+def build_search_documents(model, ids):
+    """ Search document of each of the given rows, by id """
+    documents = {}
+    for row in model.objects.filter(pk__in=ids).values_list('pk', *SEARCH_FIELDS[model]):
+        # Rows repeat for every skill and the like, their values are only kept once
+        values = documents.setdefault(row[0], {})
+        for value in row[1:]:
+            if value is not None and value != '':
+                values[str(value)] = None
+
+    return {pk: ' '.join(values) for pk, values in documents.items()}
+
+
+def refresh_search_documents(model, ids):
+    """ Rebuild the search documents of the given rows, dropping the ones of rows that no longer exist """
+    ids = list(ids)
+    if not ids:
+        return
+
+    documents = build_search_documents(model, ids)
+    label = get_label(model)
+    with transaction.atomic():
+        SearchDocument.objects.filter(label=label, object_id__in=ids).delete()
+        SearchDocument.objects.bulk_create([SearchDocument(label=label, object_id=pk, document=document)
+                                            for pk, document in documents.items()])
+
+
+def get_dependent_rows(instance):
+    """
+    Rows of the indexed tables whose document shows a value of the instance, e.g. the employees of a
+    job title or the projects of a customer, as {model: ids}
+    """
+    dependents = {}
+    for model, lookups in SEARCH_FIELDS.items():
+        for lookup in lookups:
+            related_model = model
+            path = []
+            for name in lookup.split('__')[:-1]:
+                related_model = related_model._meta.get_field(name).related_model
+                path.append(name)
+                if related_model is type(instance):
+                    dependents.setdefault(model, set()).update(
+                        model.objects.filter(**{'__'.join(path): instance.pk}).values_list('pk', flat=True))
+
+    return dependents
+
+
+def get_search_models():
+    """ Indexed tables and the tables their documents show values of """
+    models = list(SEARCH_FIELDS)
+    for model, lookups in SEARCH_FIELDS.items():
+        for lookup in lookups:
+            related_model = model
+            for name in lookup.split('__')[:-1]:
+                related_model = related_model._meta.get_field(name).related_model
+                if related_model not in models:
+                    models.append(related_model)
+    return models
+
+
+def search_object_ids(model, text):
+    """
+    Ids of the rows of an indexed table whose document has a word starting with each word of text, as a
+    subquery read from the full text index. None when text has no words.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+
+    label = get_label(model)
+    table = SearchDocument._meta.db_table
+
+    if connection.vendor == 'mysql':
+        # Words the index leaves out are matched with LIKE, among the documents the other words match
+        indexed = [word for word in words
+                   if len(word) >= MYSQL_MIN_TOKEN_SIZE and word.lower() not in MYSQL_STOPWORDS]
+        conditions = ['label = %s']
+        params = [label]
+        if indexed:
+            conditions.append('MATCH(document) AGAINST (%s IN BOOLEAN MODE)')
+            params.append(' '.join('+{}*'.format(word) for word in indexed))
+        for word in words:
+            if word not in indexed:
+                conditions.append('document LIKE %s')
+                params.append('%{}%'.format(word.replace('_', '\\_')))
+        return RawSQL('SELECT object_id FROM {} WHERE {}'.format(table, ' AND '.join(conditions)), params)
+
+    if connection.vendor == 'sqlite':
+        return RawSQL('SELECT object_id FROM {} WHERE label = %s AND id IN (SELECT rowid FROM {} WHERE {} MATCH %s)'
+                      .format(table, FTS_TABLE, FTS_TABLE), [label, ' '.join('"{}"*'.format(word) for word in words)])
+
+    # No full text index, the documents are scanned but without joining the related tables
+    documents = SearchDocument.objects.filter(label=label)
+    for word in words:
+        documents = documents.filter(document__icontains=word)
+    return documents.values('object_id')
@@ -1,8 +1,16 @@
 from rest_framework import serializers
-from .models import Employee, Allocation, AllocationDetail, Skill
+from .models import Employee, Allocation, AllocationDetail
+from .recurrence import get_occurrences
+
+
+def get_dates(detail, allocation, context):
+    """ Dates of the detail, limited to the start_date and end_date of the serializer context when given """
+    return get_occurrences(detail, context.get('start_date') or allocation.start_date,
+                           context.get('end_date') or allocation.end_date, allocation)
 
 
 class AllocationDetailSerializer(serializers.ModelSerializer):
+    dates = serializers.SerializerMethodField()
 
     class Meta:
         model = AllocationDetail
@@ -13,9 +21,14 @@ class AllocationDetailSerializer(serializers.ModelSerializer):
                   'week_of_month',
                   'day_of_month',
                   'month_of_year',
+                  'dates',
                   ]
         depth = 1
 
+    def get_dates(self, detail):
+        # Set by the prefetch of the allocation's details
+        return get_dates(detail, detail.allocation, self.context)
+
 
 class AllocationSerializer(serializers.ModelSerializer):
     details = serializers.SerializerMethodField()
@@ -35,14 +48,15 @@ class AllocationSerializer(serializers.ModelSerializer):
         depth = 1
 
     def get_details(self, allocation):
-        return AllocationDetailSerializer(AllocationDetail.objects.filter(allocation=allocation), many=True).data
+        return AllocationDetailSerializer(allocation.allocation_detail_allocation.all(), many=True,
+                                          context=self.context).data
 
 
 class EmployeeSerializer(serializers.ModelSerializer):
     allocations = serializers.SerializerMethodField()
-    job_title = serializers.CharField(source='job_title.name')
-    line_manager = serializers.CharField(source='line_manager.first_name')
-    skills = serializers.ListField(source='skills.name')
+    job_title = serializers.CharField(source='job_title.name', allow_null=True)
+    line_manager = serializers.CharField(source='line_manager.first_name', allow_null=True)
+    skills = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
 
     class Meta:
         model = Employee
@@ -59,7 +73,7 @@ class EmployeeSerializer(serializers.ModelSerializer):
         depth = 3
 
     def get_allocations(self, employee):
-        return AllocationSerializer(Allocation.objects.filter(employee=employee), many=True).data
+        return AllocationSerializer(employee.employee_allocation.all(), many=True, context=self.context).data
 
 
 class AllocationGridSerializer(serializers.Serializer):
@@ -73,27 +87,23 @@ class AllocationGridSerializer(serializers.Serializer):
     series = serializers.ListField()
 
     def to_representation(self, instance):
-        # Customize the serialization process
-        # Create a dictionary representing the custom JSON structure
-        allocations = Allocation.objects.filter(employee=instance)
         allocated_days = []
-        for allocation in allocations:
-            days = AllocationDetail.objects.filter(allocation=allocation)
-            for day in days:
-                print(day)
+        for allocation in instance.employee_allocation.all():
+            for day in allocation.allocation_detail_allocation.all():
                 allocated_days.append({'name': allocation.project.name,
                                        'allocation_type': allocation.allocation_type.name,
                                        'color': allocation.allocation_type.color_code,
                                        'start': allocation.start_date,
                                        'end': allocation.end_date,
-                                       'day_of_week': day.day_of_week})
+                                       'day_of_week': day.day_of_week,
+                                       'dates': get_dates(day, allocation, self.context)})
 
         custom_data = {
             'id': instance.emp_id,
             'name': instance.first_name,
             'last_name': instance.last_name,
             'date_of_joining': instance.date_of_joining,
-            'job_title': instance.job_title.name,
+            'job_title': instance.job_title.name if instance.job_title else None,
             'resignation_date': instance.resignation_date,
             'last_date_of_working': instance.last_date_of_working,
             'series': allocated_days
@@ -0,0 +1,227 @@
+from contextlib import contextmanager
+from threading import local
+from django.db import transaction
+from django.db.models import Min, Max
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import (AccountManager, BankHoliday, Allocation, AllocationDetail, AllocationType, CommercialStatus,
+                     Customer, Department, Employee, JobTitle, Project, ProjectType, Skill)
+from .calendar_cache import calendar_cache
+from .holidays import clear_bank_holidays
+from .skills import clear_skill_index
+from .datatables import clear_table
+from .search import SEARCH_FIELDS, get_search_models, get_dependent_rows, refresh_search_documents
+from .dates import refresh_dim_date_bank_holidays
+from .allocation_days import refresh_allocation_days
+from .rollups import refresh_utilization_rollups, refresh_employee_utilization_rollups
+
+_batch = local()
+
+# Fields holding the dates a model instance is shown on in the calendars
+DATE_FIELDS = {Allocation: ('start_date', 'end_date'),
+               Project: ('start_date', 'end_date'),
+               BankHoliday: ('date',)}
+
+
+def invalidate_calendars(start_date=None, end_date=None):
+    # Once committed, so that a calendar rebuilt in between can't cache the previous data
+    transaction.on_commit(lambda: calendar_cache.invalidate(start_date, end_date))
+
+
+def invalidate_instance_calendars(sender, instance):
+    """ Invalidate the cached calendars at the dates of the instance, before and after the change """
+    for dates in ([getattr(instance, field) for field in DATE_FIELDS[sender]],
+                  getattr(instance, 'previous_dates', None)):
+        if dates:
+            invalidate_calendars(dates[0], dates[-1])
+
+
+@receiver(pre_save, sender=Allocation)
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=BankHoliday)
+def remember_dates(sender, instance, **kwargs):
+    if instance.pk:
+        instance.previous_dates = sender.objects.filter(pk=instance.pk).values_list(*DATE_FIELDS[sender]).first()
+        if sender is BankHoliday:
+            instance.previous_location = sender.objects.filter(pk=instance.pk).values_list('location', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=BankHoliday)
+def bank_holiday_changed(sender, instance, **kwargs):
+    invalidate_instance_calendars(sender, instance)
+    # Once committed, so that a request reading the holidays in between can't cache the previous ones
+    transaction.on_commit(clear_bank_holidays)
+
+    # The date and location the holiday was moved from no longer have it
+    changes = {(instance.location, instance.date)}
+    previous_dates = getattr(instance, 'previous_dates', None)
+    if previous_dates:
+        changes.add((getattr(instance, 'previous_location', instance.location), previous_dates[0]))
+
+    refresh_dim_date_bank_holidays(sorted({date for location, date in changes}))
+
+    for location, date in changes:
+        employee_ids = Employee.objects.filter(location=location, utilization_rollups__isnull=False)\
+            .values_list('id', flat=True).distinct()
+        refresh_utilization_rollups(list(employee_ids), date, date)
+
+
+def refresh_allocation(allocation_id):
+    pending_ids = getattr(_batch, 'allocation_ids', None)
+    if pending_ids is not None:
+        pending_ids.add(allocation_id)
+        return
+
+    for employee_id, start_date, end_date in refresh_allocation_days(allocation_id):
+        refresh_utilization_rollups([employee_id], start_date, end_date)
+
+
+@contextmanager
+def batch_allocation_refresh():
+    """ Refresh every allocation touched inside the block once, when it exits, instead of once per row """
+    if getattr(_batch, 'allocation_ids', None) is not None:
+        yield
+        return
+
+    _batch.allocation_ids = set()
+    try:
+        yield
+        allocation_ids = _batch.allocation_ids
+    finally:
+        _batch.allocation_ids = None
+
+    # Deleted allocations have lost their days through the foreign key and refreshed their rollups already
+    allocation_ids = Allocation.objects.filter(id__in=allocation_ids).values_list('id', flat=True)
+    for allocation_id in sorted(allocation_ids):
+        refresh_allocation(allocation_id)
+
+
+@receiver(post_save, sender=Allocation)
+def allocation_saved(sender, instance, **kwargs):
+    invalidate_instance_calendars(sender, instance)
+    refresh_allocation(instance.id)
+
+
+@receiver(post_delete, sender=Allocation)
+def allocation_deleted(sender, instance, **kwargs):
+    invalidate_instance_calendars(sender, instance)
+    # AllocationDay rows are removed through the foreign key, only the rollups need refreshing
+    if instance.end_date is not None:
+        refresh_utilization_rollups([instance.employee_id], instance.start_date, instance.end_date)
+
+
+@receiver([post_save, post_delete], sender=AllocationDetail)
+def allocation_detail_changed(sender, instance, **kwargs):
+    dates = Allocation.objects.filter(id=instance.allocation_id).values_list('start_date', 'end_date').first()
+    if dates:
+        invalidate_calendars(*dates)
+    refresh_allocation(instance.allocation_id)
+
+
+@receiver([post_save, post_delete], sender=Project)
+def project_changed(sender, instance, **kwargs):
+    invalidate_instance_calendars(sender, instance)
+
+
+@receiver([post_save, post_delete], sender=AllocationType)
+def allocation_type_changed(sender, instance, **kwargs):
+    dates = Allocation.objects.filter(allocation_type=instance).aggregate(Min('start_date'), Max('end_date'))
+    if dates['start_date__min'] is not None:
+        invalidate_calendars(dates['start_date__min'], dates['end_date__max'])
+
+
+@receiver(post_delete, sender=Employee)
+def employee_deleted(sender, instance, **kwargs):
+    # Every employee has a row in every capacity calendar
+    invalidate_calendars()
+    transaction.on_commit(clear_skill_index)
+
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, **kwargs):
+    # Every employee has a row in every capacity calendar
+    invalidate_calendars()
+    if created:
+        transaction.on_commit(clear_skill_index)
+
+    # Available hours depend on the employee's standard hours and location
+    if not created:
+        refresh_employee_utilization_rollups(instance.id)
+
+
+@receiver(m2m_changed, sender=Employee.skills.through)
+def employee_skills_changed(sender, **kwargs):
+    # Skills are listed in the capacity calendar
+    invalidate_calendars()
+    transaction.on_commit(clear_skill_index)
+    # and searched in the employee list
+    transaction.on_commit(lambda: clear_table(Employee))
+
+
+@receiver(m2m_changed, sender=Employee.skills.through)
+def employee_skills_search(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Employees losing the skill
+        instance.search_dependents = {Employee: set(instance.employee_set.values_list('pk', flat=True))}
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            refresh_search_documents(Employee, [instance.pk])
+        elif action == 'post_clear':
+            refresh_search_documents(Employee, instance.search_dependents[Employee])
+        else:
+            refresh_search_documents(Employee, pk_set)
+
+
+@receiver([post_save, post_delete], sender=Skill)
+def skill_changed(sender, instance, **kwargs):
+    invalidate_calendars()
+    transaction.on_commit(clear_skill_index)
+
+
+@receiver([post_save, post_delete], sender=JobTitle)
+@receiver([post_save, post_delete], sender=ProjectType)
+@receiver([post_save, post_delete], sender=CommercialStatus)
+def calendar_label_changed(sender, instance, **kwargs):
+    # Job titles are shown on timeline and capacity rows, project types and commercial statuses in project headers
+    invalidate_calendars()
+
+
+# Only the tables shown in list views: a receiver for every model would keep Django from deleting rows
+# of the materialized tables in bulk
+@receiver([post_save, post_delete], sender=Department)
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=AccountManager)
+@receiver([post_save, post_delete], sender=ProjectType)
+@receiver([post_save, post_delete], sender=JobTitle)
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Skill)
+def table_changed(sender, **kwargs):
+    # Cached DataTables counts and cursors of the table, once the change is visible to other requests
+    transaction.on_commit(lambda: clear_table(sender))
+
+
+def refresh_search(instance, dependents):
+    if type(instance) in SEARCH_FIELDS:
+        refresh_search_documents(type(instance), [instance.pk])
+    for model, ids in dependents.items():
+        refresh_search_documents(model, ids)
+
+
+def search_row_saved(sender, instance, **kwargs):
+    refresh_search(instance, get_dependent_rows(instance))
+
+
+def search_row_deleting(sender, instance, **kwargs):
+    # Rows showing the instance can only be found while it exists
+    instance.search_dependents = get_dependent_rows(instance)
+
+
+def search_row_deleted(sender, instance, **kwargs):
+    refresh_search(instance, getattr(instance, 'search_dependents', {}))
+
+
+for search_model in get_search_models():
+    post_save.connect(search_row_saved, sender=search_model)
+    pre_delete.connect(search_row_deleting, sender=search_model)
+    post_delete.connect(search_row_deleted, sender=search_model)
@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from .models import Employee
+from .bench import get_capacity_employees, get_availability
+
+SKILL_INDEX_CACHE_KEY = 'resource_management_app.skill_index'
+
+
+def get_skill_index():
+    """
+    Employees per skill as bitsets, e.g. {'employee_ids': [3, 5, 8], 'skills': {1: 0b101}} where bit n of
+    a bitset stands for employee_ids[n], so the employees having several skills are found with a bitwise and.
+    """
+    skill_index = cache.get(SKILL_INDEX_CACHE_KEY)
+
+    if skill_index is None:
+        employee_ids = list(Employee.objects.order_by('id').values_list('id', flat=True))
+        employee_bits = {employee_id: 1 << index for index, employee_id in enumerate(employee_ids)}
+
+        skills = {}
+        for skill_id, employee_id in Employee.skills.through.objects.values_list('skill_id', 'employee_id'):
+            skills[skill_id] = skills.get(skill_id, 0) | employee_bits[employee_id]
+
+        skill_index = {'employee_ids': employee_ids, 'skills': skills}
+        # Kept until an employee, a skill or the skills of an employee change, see signals.py
+        cache.set(SKILL_INDEX_CACHE_KEY, skill_index, None)
+
+    return skill_index
+
+
+def clear_skill_index():
+    cache.delete(SKILL_INDEX_CACHE_KEY)
+
+
+def get_skilled_employee_ids(skill_ids):
+    """ Ids of the employees having every one of the given skills """
+    skill_index = get_skill_index()
+
+    employees = (1 << len(skill_index['employee_ids'])) - 1
+    for skill_id in skill_ids:
+        employees &= skill_index['skills'].get(skill_id, 0)
+
+    employee_ids = []
+    while employees:
+        lowest_bit = employees & -employees
+        employee_ids.append(skill_index['employee_ids'][lowest_bit.bit_length() - 1])
+        employees ^= lowest_bit
+    return employee_ids
+
+
+def search_resources(skill_ids, start_date, end_date, min_free_hours=1):
+    """
+    Capacity employees having every one of the given skills and at least min_free_hours free a week at
+    some point between the given dates, ranked as by get_availability()
+    """
+    employees = list(get_capacity_employees(start_date, end_date)
+                     .filter(id__in=get_skilled_employee_ids(skill_ids))
+                     .prefetch_related('skills'))
+
+    availability = get_availability(start_date, end_date, min_free_hours, employees)
+
+    employee_skills = {employee.id: [skill.name for skill in employee.skills.all()] for employee in employees}
+    for employee in availability['employees']:
+        employee['skills'] = employee_skills[employee['id']]
+    availability['skills'] = skill_ids
+
+    return availability
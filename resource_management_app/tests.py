@@ -1,3 +1,51 @@
+from datetime import date
+from django.contrib.auth.models import User
 from django.test import TestCase
+from .models import Allocation, AllocationType, Employee, JobTitle, Project, ProjectType
+from .utils import TimeLineCalendar
 
-# Create your tests here.
+
+class TimelineWindowTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='planner')
+        audit = {'created_by': user, 'updated_by': user}
+        job_title = JobTitle.objects.create(name='Developer', **audit)
+
+        def create_employee(emp_id, first_name):
+            return Employee.objects.create(emp_id=emp_id, first_name=first_name, last_name='Smith',
+                                           date_of_joining=date(2020, 1, 1), job_title=job_title,
+                                           email='{}@example.com'.format(first_name.lower()), gender='other',
+                                           location='uk', **audit)
+
+        create_employee('E1', 'Alice')
+        project = Project.objects.create(name='Apollo', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31),
+                                         project_type=ProjectType.objects.create(name='Fixed price', **audit),
+                                         project_phase='execution', project_status='in-flight', priority='high',
+                                         project_health='green', **audit)
+        Allocation.objects.create(employee=create_employee('E2', 'Bob'), project=project,
+                                  allocation_type=AllocationType.objects.create(name='Billable', color_code='#000',
+                                                                                **audit),
+                                  start_date=date(2025, 3, 3), end_date=date(2025, 3, 7), **audit)
+
+    def setUp(self):
+        self.cal = TimeLineCalendar(date(2025, 3, 3), date(2025, 3, 9))
+
+    def test_empty_window(self):
+        # Only the row count is of interest, e.g. to size a virtual scroll
+        show_flex_squad_header, flex_squad_employees, blocks = self.cal.get_timeline_blocks(0, 0)
+
+        self.assertFalse(show_flex_squad_header)
+        self.assertEqual(flex_squad_employees, [])
+        self.assertEqual(blocks, [])
+        # Flex squad header and Alice, then Apollo's header and Bob's allocation
+        self.assertEqual(self.cal.total_rows, 4)
+        self.assertNotIn('Flex Suad', self.cal.gettimelinecalendar(0, 0))
+
+    def test_first_row(self):
+        show_flex_squad_header, flex_squad_employees, blocks = self.cal.get_timeline_blocks(0, 1)
+
+        self.assertTrue(show_flex_squad_header)
+        self.assertEqual(flex_squad_employees, [])
+        self.assertEqual(blocks, [])
@@ -44,6 +44,7 @@ urlpatterns = [
 
     path('allocation/', views.AllocationListView.as_view(), name="allocation-list"),
     path('allocation/capacity', views.CapacityView.as_view(), name="capacity-view"),
+    path('allocation/availability', views.AvailabilityView.as_view(), name="availability-view"),
     path('allocation/create', views.AllocationCreateView.as_view(), name="allocation-create"),
     path('allocation/update/<int:pk>', views.AllocationUpdateView.as_view(), name="allocation-update"),
     path('allocation/delete/<int:pk>', views.AllocationDeleteView.as_view(), name="allocation-delete"),
@@ -52,5 +53,12 @@ urlpatterns = [
     path('accounts/logout/', views.logout, name='logout'),
 
     path('api/allocations/', views.AllocationListViewAPI.as_view()),
+    path('api/allocations/timeline', views.AllocationTimelineViewAPI.as_view()),
+    path('api/allocations/conflicts', views.AllocationConflictViewAPI.as_view()),
     path('api/allocations/capacity', views.CapacityViewAPI.as_view()),
+    path('api/allocations/availability', views.AvailabilityViewAPI.as_view()),
+    path('api/allocations/search', views.ResourceSearchViewAPI.as_view()),
+    path('api/employees/grid', views.EmployeeAllocationGridViewAPI.as_view()),
+    path('api/async/allocations/', views.AllocationListViewAsync.as_view()),
+    path('api/async/allocations/capacity', views.CapacityViewAsync.as_view()),
 ]
@@ -1,6 +1,57 @@
+import asyncio
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from .models import Allocation, AllocationDetail, Employee, Project
-from django.db.models import Q
+from functools import lru_cache
+from hashlib import md5
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from .models import (Allocation, AllocationDetail, AllocationType, BankHoliday, CommercialStatus, Employee,
+                     JobTitle, Project, ProjectType, Skill)
+from .capacity import CapacityMatrix
+from .holidays import get_bank_holidays
+from .bench import get_unallocated_employees
+from .dates import get_dim_dates, get_location_calendar
+from .recurrence import get_occurrences, get_allocation_occurrences
+from django.db.models import Q, Prefetch, Count
+
+FRAGMENT_CACHE_KEY = 'resource_management_app.fragment'
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+
+def run_concurrently(function, *args):
+    """
+    Awaitable running a blocking function in a thread of its own instead of the thread shared by
+    Django's async ORM calls, so that several queries can be in flight at once
+    """
+    def run():
+        try:
+            return function(*args)
+        finally:
+            # Each thread opens its own database connections
+            connections.close_all()
+
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+async def aiterate(iterator):
+    """ Async iterator over a blocking one, e.g. for streaming a rendered calendar from an async view """
+    iterator = iter(iterator)
+    next_chunk = sync_to_async(next)
+    done = object()
+    while True:
+        chunk = await next_chunk(iterator, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+@lru_cache(maxsize=None)
+def get_render_pool(max_workers):
+    """ Pool of threads shared by every timeline rendered in the process """
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='timeline-render')
 
 
 class TimeLineCalendar:
@@ -14,109 +65,75 @@ class TimeLineCalendar:
         no_of_hours = 0
         color_code = ''
 
-    def __init__(self, start_date=None, end_date=None):
+    def __init__(self, start_date=None, end_date=None, compact=False):
         self.start_date = start_date
         self.end_date = end_date
+        # Merge consecutive identical day cells of a row into a single cell
+        self.compact = compact
+        self.bank_holidays = None
+        # Number of rows of the whole timeline, set when it is loaded
+        self.total_rows = None
+        # Rendered project header and allocation rows by fragment key, see load_fragments()
+        self.fragments = {}
+        self.new_fragments = {}
+        self.window_bank_holidays = {}
+        # Preloaded by aload_timeline_data() and aload_capacity_matrix()
+        self.timeline_data = None
+        self.dim_dates = None
+        self.capacity_matrix = None
 
     @staticmethod
-    def get_month_header(start_date, end_date):
-        delta = timedelta(days=1)
+    def get_month_header(start_date, end_date, dim_dates=None):
         month_td = ''
-        current_month = start_date.strftime("%b")
-        month_col_span = 0
+        month_col_span = {}
 
-        while start_date <= end_date:
-            if current_month == start_date.strftime("%b"):
-                month_col_span += 1
-            else:
-                month_td += '<th colspan="{}" scope="row" style="text-align: center;vertical-align: middle;">{}</th>'\
-                    .format(month_col_span, current_month + "/" + start_date.strftime('%y'))
-                current_month = start_date.strftime("%b")
-                month_col_span = 1
-
-            start_date += delta
+        for dim_date in dim_dates or get_dim_dates(start_date, end_date):
+            label = '{}/{:02d}'.format(dim_date.month_name, dim_date.year % 100)
+            month_col_span[label] = month_col_span.get(label, 0) + 1
 
-        # loop ends once look reaches end_date hence not getting opportunity to add last month name. Due to that
-        # added this manual entry in tail end of the loop
-        month_td += '<th colspan="{}" scope="row" style="text-align: center;vertical-align: middle;">{}</th>'.format(
-            month_col_span, current_month + "/" + start_date.strftime('%y'))
+        for label, col_span in month_col_span.items():
+            month_td += '<th colspan="{}" scope="row" style="text-align: center;vertical-align: middle;">{}</th>'\
+                .format(col_span, label)
 
         return month_td
 
     @staticmethod
-    def get_week_header(start_date, end_date):
-        delta = timedelta(days=1)
+    def get_week_header(start_date, end_date, dim_dates=None):
         week_td = ''
-        current_week = start_date.strftime("%W")
-        week_col_span = 0
+        week_col_span = {}
 
-        while start_date <= end_date:
-            if current_week == start_date.strftime("%W"):
-                week_col_span += 1
-            else:
-                wc_date = start_date - delta * 2
-                week_commencing = wc_date - timedelta(days=wc_date.weekday() % 7)
+        for dim_date in dim_dates or get_dim_dates(start_date, end_date):
+            week_col_span[dim_date.week_commencing] = week_col_span.get(dim_date.week_commencing, 0) + 1
 
-                week_td += '<th colspan="{}" class="week-commencing">{}</th>'.format(
-                    week_col_span, week_commencing.strftime("%d-%m"))
-                current_week = start_date.strftime("%W")
-                week_col_span = 1
-
-            start_date += delta
-
-        wc_date = start_date - delta * 2
-        week_commencing = wc_date - timedelta(days=wc_date.weekday() % 7)
-        # loop ends once look reaches end_date hence not getting opportunity to add last month name. Due to that
-        # added this manual entry in tail end of the loop
-        week_td += '<th colspan="{}" class="week-commencing">{}</th>'.format(
-            week_col_span, week_commencing.strftime("%d-%m"))
+        for week_commencing, col_span in week_col_span.items():
+            week_td += '<th colspan="{}" class="week-commencing">{}</th>'.format(
+                col_span, week_commencing.strftime("%d-%m"))
 
         return week_td
 
     @staticmethod
     def get_week_header_v2(start_date, end_date):
-        delta = timedelta(days=1)
         week_td = ''
-        current_week = start_date.strftime("%W")
-
-        while start_date < end_date:
-            if current_week != start_date.strftime("%W"):
-                wc_date = start_date - delta * 2
-                week_commencing = wc_date - timedelta(days=wc_date.weekday() % 7)
-
-                week_td += '<th>{}</th>'.format(
-                    week_commencing.strftime("%d-%m"))
-                current_week = start_date.strftime("%W")
-            start_date += delta
+        # end_date is the week commencing date of the last (excluded) week, always show at least one week
+        last_date = max(end_date - timedelta(days=1), start_date)
 
-        wc_date = start_date - delta * 2
-        week_commencing = wc_date - timedelta(days=wc_date.weekday() % 7)
-        # loop ends once look reaches end_date hence not getting opportunity to add last month name. Due to that
-        # added this manual entry in tail end of the loop
-        week_td += '<th>{}</th>'.format(
-            week_commencing.strftime("%d-%m"))
+        for week_commencing in dict.fromkeys(d.week_commencing for d in get_dim_dates(start_date, last_date)):
+            week_td += '<th>{}</th>'.format(week_commencing.strftime("%d-%m"))
 
         return week_td
 
     @staticmethod
-    def get_date_range_header(start_date, end_date):
-        delta = timedelta(days=1)
+    def get_date_range_header(start_date, end_date, dim_dates=None):
         date_td = ''
 
-        while start_date <= end_date:
-            date_td += '<th class="weekday">{}</th>'.format(
-                start_date.strftime("%a")[0])
-            start_date += delta
+        for dim_date in dim_dates or get_dim_dates(start_date, end_date):
+            date_td += '<th class="weekday">{}</th>'.format(dim_date.day_name[0])
 
         return date_td
 
     @staticmethod
     def is_weekend(date_to_check):
-        if date_to_check.strftime("%a") == "Sat" or \
-                date_to_check.strftime("%a") == "Sun":
-            return True
-        else:
-            return False
+        return date_to_check.weekday() >= 5
 
     @staticmethod
     def get_week_commencing_date(date_to_check):
@@ -125,31 +142,81 @@ class TimeLineCalendar:
         return wc_date - timedelta(days=wc_date.weekday() % 7)
 
 
-    def is_bank_holiday(self, date_to_check):
-        bank_holidays = self.get_bank_holidays()
+    def is_bank_holiday(self, date_to_check, location):
+        return date_to_check in self.get_location_bank_holidays(location)
 
-        if date_to_check.strftime("%d-%m-%Y") in bank_holidays:
-            return True
-        else:
-            return False
+    def get_location_bank_holidays(self, location):
+        # Loaded once per calendar render from the shared bank holiday cache
+        if self.bank_holidays is None:
+            self.bank_holidays = get_bank_holidays()
+
+        return self.bank_holidays.get(location, set())
 
     @staticmethod
-    def get_bank_holidays():
-        # TODO: Replace constant values with database
-        bank_holidays = {}
+    def get_cell_state(is_booked, is_weekend, is_bank_holiday):
+        if is_booked:
+            return 'allocation-td bank-holiday' if is_bank_holiday else 'allocation-td'
+        elif is_weekend:
+            return 'weekend'
+        elif is_bank_holiday:
+            return 'bank-holiday'
+        else:
+            return 'un-allocated-td'
+
+    def get_allocation_runs(self, start_date, end_date, location, allocation=None):
+        """
+        Day cells of a row as [state, length] runs. Each step jumps straight to the next day the state
+        can change on (weekend boundary, allocation occurrence or bank holiday), so the cost follows the
+        number of state changes rather than the number of days.
+        """
+        occurrences = []
+        if allocation is not None:
+            occurrences = sorted(get_allocation_occurrences(allocation, start_date, end_date))
+        booked_days = set(occurrences)
+
+        bank_holidays = self.get_location_bank_holidays(location)
+        sorted_bank_holidays = sorted(bank_holidays)
+
+        runs = []
+        day = start_date
+        while day <= end_date:
+            is_booked = day in booked_days
+            is_bank_holiday = day in bank_holidays
+            state = self.get_cell_state(is_booked, self.is_weekend(day), is_bank_holiday)
+
+            if is_booked or is_bank_holiday:
+                length = 1
+            else:
+                last_day = end_date
+
+                for changes in (occurrences, sorted_bank_holidays):
+                    next_change = bisect_right(changes, day)
+                    if next_change < len(changes):
+                        last_day = min(last_day, changes[next_change] - timedelta(days=1))
+
+                # Days until the next weekend boundary
+                weekday = day.weekday()
+                length = min((last_day - day).days + 1, 5 - weekday if weekday < 5 else 7 - weekday)
+
+            if runs and runs[-1][0] == state:
+                runs[-1][1] += length
+            else:
+                runs.append([state, length])
 
-        bank_holidays['21-04-2023'] = 'Eid-ul-Fitr'
-        bank_holidays['15-08-2023'] = 'Independence Day'
-        bank_holidays['30-08-2023'] = 'Rakshabandhan'
-        bank_holidays['24-10-2023'] = 'Dusshera'
-        bank_holidays['13-11-2023'] = 'New Year'
-        bank_holidays['14-11-2023'] = 'Bhai Duj'
-        bank_holidays['25-12-2023'] = 'Christmas'
-        bank_holidays['15-01-2024'] = 'Vasi Uttrayan'
-        bank_holidays['26-01-2024'] = 'Republic Day'
-        bank_holidays['25-03-2024'] = 'Dhuleti'
+            day += timedelta(days=length)
 
-        return bank_holidays
+        return runs
+
+    def get_compact_tds(self, start_date, end_date, location, allocation=None):
+        tds = ''
+        for state, length in self.get_allocation_runs(start_date, end_date, location, allocation):
+            colspan = ' colspan="{}"'.format(length) if length > 1 else ''
+            if allocation is not None and state.startswith('allocation-td'):
+                tds += '<td{} bgcolor="{}" class="{}" onclick="allocation_edit({})" ></td>'.format(
+                    colspan, allocation.allocation_type.color_code, state, allocation.id)
+            else:
+                tds += '<td{} class="{}"></td>'.format(colspan, state)
+        return tds
 
     def get_employee_allocation_detail(self, start_date, end_date, employee):
 
@@ -173,13 +240,16 @@ class TimeLineCalendar:
 
         return bookings
 
-    def get_blank_tds(self, start_date, end_date):
+    def get_blank_tds(self, start_date, end_date, location):
+        if self.compact:
+            return self.get_compact_tds(start_date, end_date, location)
+
         delta = timedelta(days=1)
         tr = ''
         while start_date <= end_date:
             if self.is_weekend(start_date):
                 tr += '<td class="weekend"></td>'
-            elif self.is_bank_holiday(start_date):
+            elif self.is_bank_holiday(start_date, location):
                 tr += '<td class="bank-holiday"></td>'
             else:
                 tr += '<td class="un-allocated-td"></td>'
@@ -193,32 +263,29 @@ class TimeLineCalendar:
         total_allocation_hours = 0
         total_hours_between_dates = 0
 
-        allocation_detail = AllocationDetail.objects.filter(allocation=allocation)
+        location = allocation.employee.location
+        if self.compact:
+            return self.get_compact_tds(start_date, end_date, location, allocation)
+
+        # Uses the prefetched details when the allocation comes from load_timeline_data()
+        occurrences = get_allocation_occurrences(allocation, start_date, end_date)
 
         while start_date <= end_date:
-            allocation_data = ''
-
-            for detail in allocation_detail:
-                if start_date.weekday() == detail.day_of_week and \
-                        start_date >= allocation.start_date and \
-                        start_date <= allocation.end_date:
-
-                    class_name = ''
-                    if self.is_bank_holiday(start_date):
-                        class_name = 'bank-holiday'
-
-                    allocation_data = '<td bgcolor="{}" class="allocation-td {}" onclick="allocation_edit({})" ></td>'\
-                        .format(allocation.allocation_type.color_code, class_name, allocation.id)
-
-                    total_allocation_hours += allocation.no_of_hours
-                    break
-                else:
-                    if self.is_weekend(start_date):
-                        allocation_data = '<td class="weekend"></td>'
-                    elif self.is_bank_holiday(start_date):
-                        allocation_data = '<td class="bank-holiday"></td>'
-                    else:
-                        allocation_data = '<td class="un-allocated-td"></td>'
+            if start_date in occurrences:
+                class_name = ''
+                if self.is_bank_holiday(start_date, location):
+                    class_name = 'bank-holiday'
+
+                allocation_data = '<td bgcolor="{}" class="allocation-td {}" onclick="allocation_edit({})" ></td>'\
+                    .format(allocation.allocation_type.color_code, class_name, allocation.id)
+
+                total_allocation_hours += allocation.no_of_hours
+            elif self.is_weekend(start_date):
+                allocation_data = '<td class="weekend"></td>'
+            elif self.is_bank_holiday(start_date, location):
+                allocation_data = '<td class="bank-holiday"></td>'
+            else:
+                allocation_data = '<td class="un-allocated-td"></td>'
 
             if not self.is_weekend(start_date):
                 total_hours_between_dates += 8
@@ -228,9 +295,156 @@ class TimeLineCalendar:
 
         return timeline_tr
 
-    def gettimelinecalendar(self):
+    def get_project_queryset(self):
+        # Projects overlapping the window, served by the (start_date, end_date) index
+        return Project.objects.filter(start_date__lte=self.end_date, end_date__gte=self.start_date)\
+            .select_related('project_type', 'commercial_status')\
+            .order_by('name', 'id')
+
+    def get_allocation_queryset(self):
+        return Allocation.objects.filter(start_date__lte=self.end_date, end_date__gte=self.start_date)\
+            .select_related('employee__job_title', 'allocation_type')\
+            .order_by('employee__first_name', 'id')
+
+    def get_timeline_querysets(self):
+        """ Rows the timeline is rendered from, for conditional requests, see conditional.get_validators() """
+        allocations = self.get_allocation_queryset()
+        return [allocations,
+                AllocationDetail.objects.filter(allocation__in=allocations.order_by().values('id')),
+                self.get_project_queryset(),
+                Employee.objects.all(),
+                JobTitle.objects.all(),
+                AllocationType.objects.all(),
+                ProjectType.objects.all(),
+                CommercialStatus.objects.all(),
+                BankHoliday.objects.filter(date__range=(self.start_date, self.end_date))]
+
+    def get_capacity_querysets(self):
+        """ Rows the capacity calendar is rendered from, for conditional requests """
+        start_date, end_date = self.get_capacity_range()
+        allocations = Allocation.objects.filter(start_date__lte=end_date, end_date__gte=start_date)
+        return [allocations,
+                AllocationDetail.objects.filter(allocation__in=allocations.values('id')),
+                Employee.objects.all(),
+                JobTitle.objects.all(),
+                Skill.objects.all(),
+                BankHoliday.objects.filter(date__range=(start_date, end_date))]
+
+    def get_flex_squad_queryset(self):
+        # Employees who are not allocated in selected time frame are shown in the Flex Squad project
+        return get_unallocated_employees(self.start_date, self.end_date)
+
+    @staticmethod
+    def prefetch_allocation_details(allocations):
+        return allocations.prefetch_related(
+            Prefetch('allocation_detail_allocation', queryset=AllocationDetail.objects.order_by('id')))
+
+    def load_timeline_data(self):
+        """
+        Fetch everything the timeline needs for the selected window in a fixed number of queries
+        (projects, allocations, allocation details and flex squad employees) so that rendering
+        works purely in memory regardless of the number of projects or employees.
+        """
+        if self.timeline_data is not None:
+            return self.timeline_data
+
+        projects = list(self.get_project_queryset())
 
-        empty_tds = self.get_blank_tds(self.start_date, self.end_date)
+        project_allocations = self.group_allocations(
+            self.prefetch_allocation_details(self.get_allocation_queryset()))
+
+        flex_squad_employees = list(self.get_flex_squad_queryset())
+
+        return projects, project_allocations, flex_squad_employees
+
+    @staticmethod
+    def group_allocations(allocations):
+        project_allocations = {}
+        for allocation in allocations:
+            project_allocations.setdefault(allocation.project_id, []).append(allocation)
+        return project_allocations
+
+    async def aload_timeline_data(self):
+        """
+        Preload what load_timeline_data() and the headers read, running the independent queries (projects,
+        allocations with their details and types, flex squad, bank holidays and dates) concurrently
+        """
+        projects, allocations, flex_squad_employees, self.bank_holidays, self.dim_dates = await asyncio.gather(
+            run_concurrently(lambda: list(self.get_project_queryset())),
+            run_concurrently(lambda: list(self.prefetch_allocation_details(self.get_allocation_queryset()))),
+            run_concurrently(lambda: list(self.get_flex_squad_queryset())),
+            run_concurrently(get_bank_holidays),
+            run_concurrently(get_dim_dates, self.start_date, self.end_date))
+
+        self.timeline_data = (projects, self.group_allocations(allocations), flex_squad_employees)
+
+    def get_timeline_blocks(self, offset=None, limit=None):
+        """
+        Rows of the timeline in display order: the flex squad header and employees, then every project
+        header followed by its allocations. Returns (show flex squad header, flex squad employees,
+        [(project, show project header, allocations)]) and sets total_rows.
+
+        With a limit only the rows offset to offset + limit are returned, and only those are fetched: the
+        row count of every block comes from COUNT queries, so the cost of a window does not grow with the
+        number of employees.
+        """
+        if limit is None:
+            projects, project_allocations, flex_squad_employees = self.load_timeline_data()
+            self.total_rows = 1 + len(flex_squad_employees) + \
+                sum(1 + len(project_allocations.get(project.id, [])) for project in projects)
+            return True, flex_squad_employees, \
+                [(project, True, project_allocations.get(project.id, [])) for project in projects]
+
+        offset = offset or 0
+        window_end = offset + limit
+
+        def get_slice(first_row, no_of_rows):
+            # Part of no_of_rows rows starting at first_row that falls inside the window
+            return min(max(offset - first_row, 0), no_of_rows), min(max(window_end - first_row, 0), no_of_rows)
+
+        flex_squad = self.get_flex_squad_queryset()
+        flex_squad_count = flex_squad.count()
+        first, last = get_slice(1, flex_squad_count)
+        flex_squad_employees = list(flex_squad[first:last]) if first < last else []
+
+        allocations = self.get_allocation_queryset()
+        allocation_counts = dict(allocations.order_by().values_list('project_id').annotate(Count('id')))
+
+        row = 1 + flex_squad_count
+        window_projects = []
+        for project in self.get_project_queryset():
+            no_of_allocations = allocation_counts.get(project.id, 0)
+            first, last = get_slice(row + 1, no_of_allocations)
+            if offset <= row < window_end or first < last:
+                window_projects.append((project, offset <= row < window_end, first, last, no_of_allocations))
+            row += 1 + no_of_allocations
+        self.total_rows = row
+
+        # Projects fully inside the window are fetched together, the ones cut by its edges on their own
+        whole_project_ids = [project.id for project, show_header, first, last, no_of_allocations in window_projects
+                             if first == 0 and last == no_of_allocations]
+        project_allocations = {}
+        for allocation in self.prefetch_allocation_details(allocations.filter(project_id__in=whole_project_ids)):
+            project_allocations.setdefault(allocation.project_id, []).append(allocation)
+
+        blocks = []
+        for project, show_header, first, last, no_of_allocations in window_projects:
+            if project.id not in whole_project_ids:
+                project_allocations[project.id] = list(
+                    self.prefetch_allocation_details(allocations.filter(project_id=project.id))[first:last])
+            blocks.append((project, show_header, project_allocations.get(project.id, [])))
+
+        # The flex squad header is row 0
+        return offset <= 0 < window_end, flex_squad_employees, blocks
+
+    def gettimelinecalendar(self, offset=None, limit=None):
+        return ''.join(self.iter_timelinecalendar(offset, limit))
+
+    def iter_timelinecalendar(self, offset=None, limit=None):
+        """
+        Yield the timeline table in chunks: header, flex squad and then one chunk per project block. With
+        a limit the body only holds the rows offset to offset + limit, see get_timeline_blocks()
+        """
 
         cal = '<table id="timeline-calendar-table" class="table">'
 
@@ -243,66 +457,231 @@ class TimeLineCalendar:
             .format('Name')
         cal += '<th rowspan="2" style="vertical-align: middle;  background: gray; color: white;">{}</th>'\
             .format('Job Title')
-        cal += self.get_week_header(self.start_date, self.end_date)
+        dim_dates = self.dim_dates or get_dim_dates(self.start_date, self.end_date)
+        cal += self.get_week_header(self.start_date, self.end_date, dim_dates)
         cal += '</tr>'
 
         cal += '<tr >'
-        cal += self.get_date_range_header(self.start_date, self.end_date)
+        cal += self.get_date_range_header(self.start_date, self.end_date, dim_dates)
         cal += '</tr>'
 
         cal += '</thead>'
 
         cal += '<tbody>'
 
-        timeline_tr = ''
-        row_span = 0
+        yield cal
+
+        show_flex_squad_header, flex_squad_employees, blocks = self.get_timeline_blocks(offset, limit)
+
+        # Blank rows only differ by the employee's bank holidays
+        empty_tds = {}
 
         days_difference = (self.end_date-self.start_date)
         row_span = days_difference.days + 3
 
-        flex_squad = '<tr>'
-        flex_squad += '<td class="project-detail" colspan="{}">{}</td>'.format(row_span, 'Flex Suad')
-        flex_squad += '</tr>'
-        # Fetch employees who are not allocated in selected time frame and add them in the Flex Squad project
-        emps = [allocation.employee.id for allocation in Allocation.objects.filter(start_date__lte=self.end_date,
-                                                                                   end_date__gte=self.start_date)]
-
-        for emp in Employee.objects.all().exclude(id__in=emps):
+        flex_squad = ''
+        if show_flex_squad_header:
+            flex_squad += '<tr>'
+            flex_squad += '<td class="project-detail" colspan="{}">{}</td>'.format(row_span, 'Flex Suad')
+            flex_squad += '</tr>'
+        for emp in flex_squad_employees:
             flex_squad += '<tr>'
             flex_squad += '<th style="white-space: nowrap;" >{}</th>'.format(emp.first_name)
             flex_squad += '<th style="white-space: nowrap;">{}</th>'.format(emp.job_title.name)
-            flex_squad += empty_tds
+            if emp.location not in empty_tds:
+                empty_tds[emp.location] = self.get_blank_tds(self.start_date, self.end_date, emp.location)
+            flex_squad += empty_tds[emp.location]
             flex_squad += '</tr>'
 
-        cal += flex_squad
+        yield flex_squad
+
+        self.load_fragments(blocks, row_span)
+        yield from self.render_project_blocks(blocks, row_span)
+        self.save_fragments()
+
+        yield '</tbody></table>'
 
-        for project in Project.objects.filter(start_date__lte=self.end_date, end_date__gte=self.start_date)\
-                .order_by('name'):
-            timeline_tr = '<tr>'
-            timeline_tr += '<td class="project-detail" colspan="{}">{}- Project Type:{}, Start date:{}, ' \
-                           'End date:{}, Commercial Status: {}</td>'.format(
-                            row_span, project.name, project.project_type.name,
-                            project.start_date, project.end_date, project.commercial_status)
+    def render_project_blocks(self, blocks, row_span):
+        """
+        Project blocks rendered one after another, or by the pool of threads when
+        RESOURCE_MANAGEMENT_TIMELINE_RENDER_WORKERS is set. Blocks only read the data and fragments loaded
+        beforehand, and come out in project order either way.
+        """
+        workers = getattr(settings, 'RESOURCE_MANAGEMENT_TIMELINE_RENDER_WORKERS', 0)
+        if workers < 1 or len(blocks) < 2:
+            for project, show_header, allocations in blocks:
+                yield self.get_project_tr(project, allocations, row_span, show_header)
+            return
 
+        yield from get_render_pool(workers).map(
+            lambda block: self.get_project_tr(block[0], block[2], row_span, block[1]), blocks)
+
+    def get_project_tr(self, project, allocations, row_span, show_header=True):
+        """ Project header row followed by one row per allocation of the project """
+        timeline_tr = ''
+        if show_header:
+            timeline_tr += self.get_fragment(self.get_project_fragment_key(project, row_span),
+                                             lambda: self.get_project_header_tr(project, row_span))
+
+        for allocation in allocations:
+            timeline_tr += '<tr>'
+            timeline_tr += "<th style='white-space: nowrap;' >{}</th>".format(allocation.employee.first_name)
+            timeline_tr += "<th style='white-space: nowrap;'>{}</th>".format(allocation.employee.job_title.name)
+            timeline_tr += self.get_fragment(
+                self.get_allocation_fragment_key(allocation),
+                lambda: self.get_employee_allocation_tr(self.start_date, self.end_date, allocation))
             timeline_tr += '</tr>'
 
-            for allocation in Allocation.objects.filter(project=project, start_date__lte=self.end_date,
-                                                        end_date__gte=self.start_date).order_by('employee__first_name'):
-                timeline_tr += '<tr>'
-                timeline_tr += "<th style='white-space: nowrap;' >{}</th>".format(allocation.employee.first_name)
-                timeline_tr += "<th style='white-space: nowrap;'>{}</th>".format(allocation.employee.job_title.name)
-                timeline_tr += self.get_employee_allocation_tr(self.start_date, self.end_date, allocation)
-                timeline_tr += '</tr>'
+        return timeline_tr
 
-            cal += timeline_tr
+    @staticmethod
+    def get_project_header_tr(project, row_span):
+        timeline_tr = '<tr>'
+        timeline_tr += '<td class="project-detail" colspan="{}">{}- Project Type:{}, Start date:{}, ' \
+                       'End date:{}, Commercial Status: {}</td>'.format(
+                        row_span, project.name, project.project_type.name,
+                        project.start_date, project.end_date, project.commercial_status)
+
+        timeline_tr += '</tr>'
+        return timeline_tr
 
-        cal += '</tbody>'
-        cal += '</table>'
+    @staticmethod
+    def get_fragment_key(*parts):
+        # Hashed as the parts can be longer than cache backends accept in a key
+        return '{}.{}'.format(FRAGMENT_CACHE_KEY, md5(repr(parts).encode()).hexdigest())
+
+    def get_project_fragment_key(self, project, row_span):
+        return self.get_fragment_key('project', project.id, project.version, row_span, project.name,
+                                     project.project_type.name, project.start_date, project.end_date,
+                                     str(project.commercial_status))
+
+    def get_allocation_fragment_key(self, allocation):
+        """
+        Key of the day cells of an allocation row: the allocation and AllocationDetail versions, along with
+        the window and every other field the cells are rendered from, so edits that don't bump a version
+        are not served stale either.
+        """
+        location = allocation.employee.location
+        if location not in self.window_bank_holidays:
+            self.window_bank_holidays[location] = sorted(
+                day for day in self.get_location_bank_holidays(location) if self.start_date <= day <= self.end_date)
+
+        details = [(detail.id, detail.version, detail.reccurring_type, detail.seperation_count,
+                    detail.max_num_of_accurrences, detail.day_of_week, detail.week_of_month, detail.day_of_month,
+                    detail.month_of_year) for detail in allocation.allocation_detail_allocation.all()]
+
+        return self.get_fragment_key('allocation', allocation.id, allocation.version, details,
+                                     self.start_date, self.end_date, self.compact, allocation.start_date,
+                                     allocation.end_date, allocation.allocation_type.color_code, location,
+                                     self.window_bank_holidays[location])
+
+    def load_fragments(self, blocks, row_span):
+        """ Fetch the cached project header and allocation rows of the blocks in a single cache round trip """
+        keys = []
+        for project, show_header, allocations in blocks:
+            if show_header:
+                keys.append(self.get_project_fragment_key(project, row_span))
+            keys += [self.get_allocation_fragment_key(allocation) for allocation in allocations]
+
+        self.fragments = cache.get_many(keys)
+
+    def get_fragment(self, key, render):
+        if key not in self.fragments:
+            self.fragments[key] = self.new_fragments[key] = render()
+        return self.fragments[key]
+
+    def save_fragments(self):
+        # Keys change with the content, so fragments never need invalidating
+        if self.new_fragments:
+            cache.set_many(self.new_fragments, FRAGMENT_TIMEOUT)
+            self.new_fragments = {}
 
-        return cal
+    @staticmethod
+    def get_weekday_mask(allocation):
+        # Bit n is set when the allocation is booked weekly on weekday n (Monday is 0)
+        weekday_mask = 0
+        for detail in allocation.allocation_detail_allocation.all():
+            if detail.reccurring_type == 'weekly' and not detail.seperation_count:
+                weekday_mask |= 1 << detail.day_of_week
+        return weekday_mask
+
+    def get_occurrence_dates(self, allocation):
+        # Dates of the occurrences a weekday mask can't describe (daily, monthly, every other week...)
+        dates = set()
+        for detail in allocation.allocation_detail_allocation.all():
+            if detail.reccurring_type != 'weekly' or detail.seperation_count:
+                dates.update(get_occurrences(detail, self.start_date, self.end_date, allocation))
+        return sorted(dates)
+
+    def timelinecalendar_data(self, offset=None, limit=None):
+        """
+        Structured timeline for client side rendering: allocation spans per project instead of one
+        table cell per day. Allocation types and bank holidays are sent once for the whole window.
+        With a limit only the rows offset to offset + limit are included, see get_timeline_blocks()
+        """
+        show_flex_squad_header, flex_squad_employees, blocks = self.get_timeline_blocks(offset, limit)
+
+        allocation_types = {}
+        for project, show_header, allocations in blocks:
+            for allocation in allocations:
+                allocation_types[allocation.allocation_type_id] = {
+                    'name': allocation.allocation_type.name,
+                    'color_code': allocation.allocation_type.color_code}
 
+        bank_holidays = {}
+        if self.bank_holidays is None:
+            self.bank_holidays = get_bank_holidays()
+        for location, dates in self.bank_holidays.items():
+            bank_holidays[location] = sorted(d for d in dates if self.start_date <= d <= self.end_date)
+
+        return {
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'total_rows': self.total_rows,
+            'offset': offset or 0,
+            'limit': limit,
+            'allocation_types': allocation_types,
+            'bank_holidays': bank_holidays,
+            'flex_squad': [
+                {'employee_id': emp.id,
+                 'first_name': emp.first_name,
+                 'job_title': emp.job_title.name if emp.job_title else None,
+                 'location': emp.location}
+                for emp in flex_squad_employees
+            ],
+            'projects': [
+                {'id': project.id,
+                 'name': project.name,
+                 'project_type': project.project_type.name,
+                 'start_date': project.start_date,
+                 'end_date': project.end_date,
+                 'commercial_status': str(project.commercial_status),
+                 'rows': [
+                     {'allocation_id': allocation.id,
+                      'employee_id': allocation.employee_id,
+                      'first_name': allocation.employee.first_name,
+                      'job_title': allocation.employee.job_title.name if allocation.employee.job_title else None,
+                      'location': allocation.employee.location,
+                      'start_date': allocation.start_date,
+                      'end_date': allocation.end_date,
+                      'weekday_mask': self.get_weekday_mask(allocation),
+                      'dates': self.get_occurrence_dates(allocation),
+                      'no_of_hours': allocation.no_of_hours,
+                      'allocation_type': allocation.allocation_type_id,
+                      'cells': self.get_allocation_runs(self.start_date, self.end_date,
+                                                        allocation.employee.location,
+                                                        allocation) if self.compact else None}
+                     for allocation in allocations
+                 ]}
+                for project, show_header, allocations in blocks
+            ]
+        }
 
     def capacitycalendar(self):
+        return ''.join(self.iter_capacitycalendar())
+
+    def iter_capacitycalendar(self):
+        """ Yield the capacity table in chunks: header and then one chunk per employee row """
 
         cal = '<table id="capacity-calendar" class="table">'
         cal += '<thead>'
@@ -320,58 +699,86 @@ class TimeLineCalendar:
 
         cal += '<tbody>'
 
-        delta = timedelta(days=1)
-        start_date = self.get_week_commencing_date(self.start_date)
-        end_date = self.get_week_commencing_date(self.end_date)
+        yield cal
 
-        for employee in Employee.objects.all():
+        capacity = self.get_capacity_matrix()
+        weekly_utilization = capacity.get_weekly_utilization()
 
-            allocation_detail = self.get_employee_allocation_detail(self.get_week_commencing_date(self.start_date),
-                                                                    self.get_week_commencing_date(self.end_date),
-                                                                    employee)
-            total_allocation_hours = 0
+        for index, employee in enumerate(capacity.employees):
             employee_tr = '<tr>'
             employee_tr += '<td style="white-space: nowrap;">{}</td>'.format(employee.first_name)
             employee_tr += '<td style="white-space: nowrap;">{}</td>'.format(employee.job_title.name)
             employee_tr += '<td style="white-space: nowrap;">{}</td>'.format(','.join([s.name for s in employee.skills.all()]))
 
-            start_date = self.get_week_commencing_date(self.start_date)
-            end_date = self.get_week_commencing_date(self.end_date)
-            current_week = self.start_date.strftime("%W")
-            while start_date <= end_date:
-
-                for detail in allocation_detail:
-                    if start_date.weekday() == detail.day_of_week and \
-                            start_date >= detail.start_date and \
-                            start_date <= detail.end_date:
+            for allocation_percentage in weekly_utilization[index].tolist():
+                employee_tr += "<td style=background:{};color:white;text-align:right>{} %</td>".format(
+                    self.get_heatmap_color(allocation_percentage), allocation_percentage)
 
-                        total_allocation_hours += detail.no_of_hours
-
-                if start_date.strftime("%a") == 'Sun':
-                    allocation_percentage = (total_allocation_hours / 40)
-
-                    # progressbar = '<div class ="progress" style="height: 20px;">'
-                    # progressbar += '<div class ="progress-bar"'
-                    # progressbar += ' role="progressbar" aria-valuenow="{}" aria-valuemin="0" aria-valuemax="100"'.format(total_allocation_hours)
-                    # progressbar += ' style="width: {:.0%}" >'.format(allocation_percentage)
-                    # progressbar += '{:.0%}</div>'.format(allocation_percentage)
-                    # progressbar += '</div>'
-
-                    current_week = start_date.strftime("%W")
-
-                    # employee_tr += "<td>{}</td>".format(progressbar)
-                    employee_tr += "<td style=background:{};color:white;text-align:right>{} %</td>".format(self.get_heatmap_color(allocation_percentage*100), allocation_percentage*100)
-                    total_allocation_hours = 0
+            employee_tr += "</tr>"
+            yield employee_tr
 
-                start_date += delta
+        yield '</tbody></table>'
 
-            employee_tr += "</tr>"
-            cal += employee_tr
+    def get_capacity_weeks(self):
+        """ First day and number of weeks of the capacity calendar """
+        start_date = self.get_week_commencing_date(self.start_date)
+        end_date = self.get_week_commencing_date(self.end_date)
+        # Always show at least one week, in line with the week header
+        return start_date, max((end_date - start_date).days // 7, 1)
 
-        cal += '</tbody>'
-        cal += '</table>'
+    def get_capacity_range(self):
+        """ First and last day of the whole weeks the capacity calendar covers """
+        start_date, no_of_weeks = self.get_capacity_weeks()
+        return start_date, start_date + timedelta(weeks=no_of_weeks, days=-1)
 
-        return cal
+    @staticmethod
+    def get_capacity_employee_queryset():
+        return Employee.objects.select_related('job_title').prefetch_related('skills').order_by('id')
+
+    def get_capacity_matrix(self):
+        """ Build the employees x days hours matrix behind the capacity calendar """
+        if self.capacity_matrix is not None:
+            return self.capacity_matrix
+
+        start_date, no_of_weeks = self.get_capacity_weeks()
+        employees = self.get_capacity_employee_queryset()
+
+        working_days, bank_holidays = get_location_calendar(start_date, start_date + timedelta(weeks=no_of_weeks, days=-1))
+
+        return CapacityMatrix(start_date, no_of_weeks, employees, working_days, bank_holidays).load_allocations()
+
+    async def aload_capacity_matrix(self):
+        """ Preload the capacity matrix, reading employees, working days and allocated hours concurrently """
+        start_date, no_of_weeks = self.get_capacity_weeks()
+        end_date = start_date + timedelta(weeks=no_of_weeks, days=-1)
+
+        employees, (working_days, bank_holidays), hours = await asyncio.gather(
+            run_concurrently(lambda: list(self.get_capacity_employee_queryset())),
+            run_concurrently(get_location_calendar, start_date, end_date),
+            run_concurrently(lambda: list(CapacityMatrix.get_daily_hours_queryset(start_date, end_date))))
+
+        self.capacity_matrix = CapacityMatrix(start_date, no_of_weeks, employees, working_days, bank_holidays)
+        self.capacity_matrix.add_hours(hours)
+
+    def capacitycalendar_data(self):
+        capacity = self.get_capacity_matrix()
+        weekly_hours = capacity.get_weekly_hours().tolist()
+        weekly_capacity = capacity.get_weekly_capacity().tolist()
+        weekly_utilization = capacity.get_weekly_utilization().tolist()
+
+        return {
+            'weeks': [capacity.start_date + timedelta(weeks=week) for week in range(capacity.no_of_weeks)],
+            'employees': [
+                {'id': employee.id,
+                 'first_name': employee.first_name,
+                 'job_title': employee.job_title.name if employee.job_title else None,
+                 'skills': [s.name for s in employee.skills.all()],
+                 'allocated_hours': weekly_hours[index],
+                 'available_hours': weekly_capacity[index],
+                 'utilization': weekly_utilization[index]}
+                for index, employee in enumerate(capacity.employees)
+            ]
+        }
 
     @staticmethod
     def get_heatmap_color(value):
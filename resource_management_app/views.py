@@ -5,15 +5,27 @@ from .forms import (DepartmentForm, AccountManagerForm,
                     EmployeeForm, ProjectForm, AllocationForm)
 from .models import (Department, AccountManager, Customer, ProjectType,
                      JobTitle, Employee, Project, AllocationType,
-                     Allocation, AllocationDetail)
+                     Allocation, AllocationDetail, Skill)
+from .serializers import EmployeeSerializer, AllocationGridSerializer
+from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
-from django.db.models import Q
-from django.http import JsonResponse
-from .utils import TimeLineCalendar
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from .utils import TimeLineCalendar, aiterate, run_concurrently
+from .rollups import get_utilization_rollups
+from .conflicts import find_allocation_conflicts
+from .bench import get_availability
+from .skills import search_resources
+from .calendar_cache import calendar_cache
+from .conditional import aconditional_response, conditional_response
+from .datatables import DataTablesMixin
+from .signals import refresh_allocation, batch_allocation_refresh
 from django.utils.safestring import mark_safe
+from rest_framework.exceptions import ParseError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from dateutil import parser
@@ -48,56 +60,21 @@ DEPARTMENT VIEWS
 '''
 
 
-class DepartmentListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class DepartmentListView(LoginRequiredMixin, PermissionRequiredMixin, DataTablesMixin, ListView):
     model = Department
     context_object_name = 'departments'
     queryset = Department.objects.all()
     template_name = 'department/department_list.html'
     paginate_by = 1
     permission_required = 'resource_management_app.view_department'
+    datatables_columns = ['name', 'description']
+    datatables_search = ['name', 'description']
+    datatables_values = ['id', 'name', 'description']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.GET.get("datatables"):
-            # Get the datatable parameters from the request
-            draw = int(self.request.GET.get("draw", "1"))
-            start = int(self.request.GET.get("start", "0"))
-            length = int(self.request.GET.get("length", "10"))
-            order_column_index = int(self.request.GET.get('order[0][column]', 0))
-            order_direction = self.request.GET.get('order[0][dir]', 'asc')
-            sv = self.request.GET.get("search[value]", None)
-
-            # Determine the column to sort by
-            columns = ['name', 'description']  # Replace with your column names
-            order_column = columns[order_column_index]
-            # replacing desc and asc befcause Django is accepting blank for assending order and - for decanding order
-            order_direction = order_direction.replace('asc', '')
-            order_direction = order_direction.replace('desc', '-')
-
-            qs = self.get_queryset()
-            if sv:
-                qs = qs.filter(
-                    Q(name__icontains=sv)
-                    | Q(description__icontains=sv)
-                )
-            filtered_count = qs.count()
-            qs = qs.order_by(f'{order_direction}{order_column}')
-            qs = qs[start: start + length]
-
-            return JsonResponse(
-                {
-                    "recordsTotal": self.get_queryset().count(),
-                    "recordsFiltered": filtered_count,
-                    "draw": draw,
-                    "data": list(qs.values()),
-                },
-                safe=False,
-            )
-        return super().render_to_response(context, **response_kwargs)
-
 
 class DepartmentCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     model = Department
@@ -144,55 +121,23 @@ CUSTOMER VIEWS
 '''
 
 
-class CustomerListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class CustomerListView(LoginRequiredMixin, PermissionRequiredMixin, DataTablesMixin, ListView):
     model = Customer
     context_object_name = 'customers'
     queryset = Customer.objects.all()
     template_name = 'customer/customer_list.html'
     # paginate_by = 1
     permission_required = 'resource_management_app.view_customer'
+    datatables_columns = ['name', 'description', 'account_manager__first_name']
+    datatables_search_index = True
+    datatables_values = ['id', 'name', 'description', 'account_manager__first_name']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.GET.get("datatables"):
-            draw = int(self.request.GET.get("draw", "1"))
-            start = int(self.request.GET.get("start", "0"))
-            length = int(self.request.GET.get("length", "10"))
-            order_column_index = int(self.request.GET.get('order[0][column]', 0))
-            order_direction = self.request.GET.get('order[0][dir]', 'asc')
-            sv = self.request.GET.get("search[value]", None)
-
-            # Determine the column to sort by
-            columns = ['name', 'description', 'account_manager__first_name']  # Replace with your column names
-            order_column = columns[order_column_index]
-            # replacing desc and asc befcause Django is accepting blank for assending order and - for decanding order
-            order_direction = order_direction.replace('asc', '')
-            order_direction = order_direction.replace('desc', '-')
-
-            qs = self.get_queryset().order_by("name")
-            if sv:
-                qs = qs.filter(
-                    Q(name__icontains=sv)
-                    | Q(description__icontains=sv)
-                    | Q(account_manager__first_name__icontains=sv)
-                )
-            filtered_count = qs.count()
-            qs = qs.order_by(f'{order_direction}{order_column}')
-            qs = qs[start: start + length]
-
-            return JsonResponse(
-                {
-                    "recordsTotal": self.get_queryset().count(),
-                    "recordsFiltered": filtered_count,
-                    "draw": draw,
-                    "data": list(qs.values('id', 'name', 'description', 'account_manager__first_name')),
-                },
-                safe=False,
-            )
-        return super().render_to_response(context, **response_kwargs)
+    def get_validator_querysets(self):
+        return [Customer.objects.all(), AccountManager.objects.all()]
 
 
 class CustomerCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
@@ -240,57 +185,21 @@ ACCOUNT MANAGER VIEWS
 '''
 
 
-class AccountManagerListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class AccountManagerListView(LoginRequiredMixin, PermissionRequiredMixin, DataTablesMixin, ListView):
     model = AccountManager
     context_object_name = 'accountmanagers'
     queryset = AccountManager.objects.all()
     template_name = 'accountmanager/accountmanager_list.html'
     # paginate_by = 1
     permission_required = 'resource_management_app.view_accountmanager'
+    datatables_columns = ['first_name', 'last_name', 'email', 'phone']
+    datatables_search_index = True
+    datatables_values = ['id', 'first_name', 'last_name', 'email', 'phone']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.GET.get("datatables"):
-            draw = int(self.request.GET.get("draw", "1"))
-            start = int(self.request.GET.get("start", "0"))
-            length = int(self.request.GET.get("length", "10"))
-            order_column_index = int(self.request.GET.get('order[0][column]', 0))
-            order_direction = self.request.GET.get('order[0][dir]', 'asc')
-            sv = self.request.GET.get("search[value]", None)
-
-            # Determine the column to sort by
-            columns = ['first_name', 'last_name', 'email', 'phone']  # Replace with your column names
-            order_column = columns[order_column_index]
-            # replacing desc and asc befcause Django is accepting blank for assending order and - for decanding order
-            order_direction = order_direction.replace('asc', '')
-            order_direction = order_direction.replace('desc', '-')
-
-            qs = self.get_queryset().order_by("first_name")
-            if sv:
-                qs = qs.filter(
-                    Q(first_name__icontains=sv)
-                    | Q(last_name__icontains=sv)
-                    | Q(email__icontains=sv)
-                    | Q(phone__icontains=sv)
-                )
-            filtered_count = qs.count()
-            qs = qs.order_by(f'{order_direction}{order_column}')
-            qs = qs[start: start + length]
-
-            return JsonResponse(
-                {
-                    "recordsTotal": self.get_queryset().count(),
-                    "recordsFiltered": filtered_count,
-                    "draw": draw,
-                    "data": list(qs.values('id', 'first_name', 'last_name', 'email', 'phone')),
-                },
-                safe=False,
-            )
-        return super().render_to_response(context, **response_kwargs)
-
 
 class AccountManagerCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     model = AccountManager
@@ -336,54 +245,20 @@ PROJECT TYPE VIEWS
 '''
 
 
-class ProjectTypeListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class ProjectTypeListView(LoginRequiredMixin, PermissionRequiredMixin, DataTablesMixin, ListView):
     model = ProjectType
     context_object_name = 'projecttypes'
     queryset = ProjectType.objects.all()
     template_name = 'projecttype/projecttype_list.html'
     permission_required = 'resource_management_app.view_projecttype'
+    datatables_columns = ['name', 'description']
+    datatables_search = ['name', 'description']
+    datatables_values = ['id', 'name', 'description']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.GET.get("datatables"):
-            draw = int(self.request.GET.get("draw", "1"))
-            start = int(self.request.GET.get("start", "0"))
-            length = int(self.request.GET.get("length", "10"))
-            order_column_index = int(self.request.GET.get('order[0][column]', 0))
-            order_direction = self.request.GET.get('order[0][dir]', 'asc')
-            sv = self.request.GET.get("search[value]", None)
-
-            # Determine the column to sort by
-            columns = ['name', 'description']  # Replace with your column names
-            order_column = columns[order_column_index]
-            # replacing desc and asc befcause Django is accepting blank for assending order and - for decanding order
-            order_direction = order_direction.replace('asc', '')
-            order_direction = order_direction.replace('desc', '-')
-
-            qs = self.get_queryset().order_by("name")
-            if sv:
-                qs = qs.filter(
-                    Q(name__icontains=sv)
-                    | Q(description__icontains=sv)
-                )
-            filtered_count = qs.count()
-            qs = qs.order_by(f'{order_direction}{order_column}')
-            qs = qs[start: start + length]
-
-            return JsonResponse(
-                {
-                    "recordsTotal": self.get_queryset().count(),
-                    "recordsFiltered": filtered_count,
-                    "draw": draw,
-                    "data": list(qs.values('id', 'name', 'description')),
-                },
-                safe=False,
-            )
-        return super().render_to_response(context, **response_kwargs)
-
 
 class ProjectTypeCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     model = ProjectType
@@ -429,54 +304,20 @@ JOB TITLE VIEWS
 '''
 
 
-class JobTitleListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class JobTitleListView(LoginRequiredMixin, PermissionRequiredMixin, DataTablesMixin, ListView):
     model = JobTitle
     context_object_name = 'jobtitles'
     queryset = JobTitle.objects.all()
     template_name = 'jobtitle/jobtitle_list.html'
     permission_required = 'resource_management_app.view_jobtitle'
+    datatables_columns = ['name', 'description']
+    datatables_search = ['name', 'description']
+    datatables_values = ['id', 'name', 'description']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.GET.get("datatables"):
-            draw = int(self.request.GET.get("draw", "1"))
-            start = int(self.request.GET.get("start", "0"))
-            length = int(self.request.GET.get("length", "10"))
-            order_column_index = int(self.request.GET.get('order[0][column]', 0))
-            order_direction = self.request.GET.get('order[0][dir]', 'asc')
-            sv = self.request.GET.get("search[value]", None)
-
-            # Determine the column to sort by
-            columns = ['name', 'description']  # Replace with your column names
-            order_column = columns[order_column_index]
-            # replacing desc and asc befcause Django is accepting blank for assending order and - for decanding order
-            order_direction = order_direction.replace('asc', '')
-            order_direction = order_direction.replace('desc', '-')
-
-            qs = self.get_queryset().order_by("name")
-            if sv:
-                qs = qs.filter(
-                    Q(name__icontains=sv)
-                    | Q(description__icontains=sv)
-                )
-            filtered_count = qs.count()
-            qs = qs.order_by(f'{order_direction}{order_column}')
-            qs = qs[start: start + length]
-
-            return JsonResponse(
-                {
-                    "recordsTotal": self.get_queryset().count(),
-                    "recordsFiltered": filtered_count,
-                    "draw": draw,
-                    "data": list(qs.values('id', 'name', 'description')),
-                },
-                safe=False,
-            )
-        return super().render_to_response(context, **response_kwargs)
-
 
 class JobTitleCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     model = JobTitle
@@ -522,63 +363,29 @@ EMPLOYEE VIEWS
 '''
 
 
-class EmployeeListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class EmployeeListView(LoginRequiredMixin, PermissionRequiredMixin, DataTablesMixin, ListView):
     model = Employee
     context_object_name = 'employees'
     queryset = Employee.objects.all()
     template_name = 'employee/employee_list.html'
     permission_required = 'resource_management_app.view_employee'
+    datatables_columns = ['emp_id', 'first_name', 'last_name', 'job_title__name', 'line_manager__first_name',
+                          'skills__name']
+    datatables_search_index = True
+    datatables_select_related = ['job_title', 'line_manager']
+    datatables_prefetch_related = ['skills']
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.GET.get("datatables"):
-            draw = int(self.request.GET.get("draw", "1"))
-            start = int(self.request.GET.get("start", "0"))
-            length = int(self.request.GET.get("length", "10"))
-            order_column_index = int(self.request.GET.get('order[0][column]', 0))
-            order_direction = self.request.GET.get('order[0][dir]', 'asc')
-            sv = self.request.GET.get("search[value]", None)
-
-            # Determine the column to sort by
-            columns = ['emp_id','first_name', 'last_name', 'job_title__name', 'line_manager__first_name',
-                       'skills__name']  # Replace with your column names
-            order_column = columns[order_column_index]
-            # replacing desc and asc befcause Django is accepting blank for assending order and - for decanding order
-            order_direction = order_direction.replace('asc', '')
-            order_direction = order_direction.replace('desc', '-')
-
-            qs = self.get_queryset().order_by("first_name")
-            if sv:
-                qs = qs.filter(
-                    Q(first_name__icontains=sv)
-                    | Q(last_name__icontains=sv)
-                    | Q(job_title__name__contains=sv)
-                    | Q(line_manager__first_name__contains=sv)
-                    | Q(skills__name__contains=sv)
-                )
-            filtered_count = qs.count()
-            qs = qs.order_by(f'{order_direction}{order_column}').distinct()
-            qs = qs[start: start + length]
-
-            return JsonResponse(
-                {
-                    "recordsTotal": self.get_queryset().count(),
-                    "recordsFiltered": filtered_count,
-                    "draw": draw,
-                    "data": list([
-                        {'id': e.id,
-                         'emp_id': e.emp_id,
-                         'first_name': e.first_name,
-                         'last_name': e.last_name,
-                         'job_title__name': e.job_title.name,
-                         'line_manager__first_name': e.line_manager.first_name,
-                         'skills__name': [s.name for s in e.skills.all().distinct()]}
-                        for e in qs.prefetch_related('skills')
-                    ])
-
-                },
-                safe=False,
-            )
-        return super().render_to_response(context, **response_kwargs)
+    def get_validator_querysets(self):
+        return [Employee.objects.all(), JobTitle.objects.all(), Skill.objects.all()]
+
+    def get_datatables_row(self, employee):
+        return {'id': employee.id,
+                'emp_id': employee.emp_id,
+                'first_name': employee.first_name,
+                'last_name': employee.last_name,
+                'job_title__name': employee.job_title.name if employee.job_title else None,
+                'line_manager__first_name': employee.line_manager.first_name if employee.line_manager else None,
+                'skills__name': [skill.name for skill in employee.skills.all()]}
 
 
 class EmployeeCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
@@ -625,60 +432,20 @@ PROJECT VIEWS
 '''
 
 
-class ProjectListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class ProjectListView(LoginRequiredMixin, PermissionRequiredMixin, DataTablesMixin, ListView):
     model = Project
     context_object_name = 'projects'
     queryset = Project.objects.all()
     template_name = 'project/project_list.html'
     permission_required = 'resource_management_app.view_project'
+    datatables_columns = ['name', 'start_date', 'end_date', 'customer__name', 'project_type__name',
+                          'customer_delivery_lead__first_name', 'service_delivery_manager__first_name']
+    datatables_search_index = True
+    datatables_values = ['id', 'name', 'start_date', 'end_date', 'customer__name', 'project_type__name',
+                         'customer_delivery_lead__first_name', 'service_delivery_manager__first_name']
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.GET.get("datatables"):
-            draw = int(self.request.GET.get("draw", "1"))
-            start = int(self.request.GET.get("start", "0"))
-            length = int(self.request.GET.get("length", "10"))
-            order_column_index = int(self.request.GET.get('order[0][column]', 0))
-            order_direction = self.request.GET.get('order[0][dir]', 'asc')
-            sv = self.request.GET.get("search[value]", None)
-
-            # Determine the column to sort by
-            columns = ['name', 'start_date', 'end_date', 'customer__name', 'project_type__name',
-                       'customer_delivery_lead__first_name', 'service_delivery_manager__first_name']
-            order_column = columns[order_column_index]
-            # replacing desc and asc befcause Django is accepting blank for assending order and - for decanding order
-            order_direction = order_direction.replace('asc', '')
-            order_direction = order_direction.replace('desc', '-')
-
-            qs = self.get_queryset().order_by("name")
-            if sv:
-                qs = qs.filter(
-                    Q(name__icontains=sv)
-                    | Q(start_date__icontains=sv)
-                    | Q(start_date__icontains=sv)
-                    | Q(end_date__icontains=sv)
-                    | Q(customer__name__icontains=sv)
-                    | Q(project_type__name__icontains=sv)
-                    | Q(customer_delivery_lead__first_name__icontains=sv)
-                    | Q(service_delivery_manager__first_name__icontains=sv)
-                )
-            filtered_count = qs.count()
-            qs = qs.order_by(f'{order_direction}{order_column}')
-            qs = qs[start: start + length]
-
-            return JsonResponse(
-                {
-                    "recordsTotal": self.get_queryset().count(),
-                    "recordsFiltered": filtered_count,
-                    "draw": draw,
-                    "data": list(qs.values('id', 'name', 'start_date', 'end_date',
-                                           'customer__name', 'project_type__name',
-                                           'customer_delivery_lead__first_name',
-                                           'service_delivery_manager__first_name'))
-
-                },
-                safe=False,
-            )
-        return super().render_to_response(context, **response_kwargs)
+    def get_validator_querysets(self):
+        return [Project.objects.all(), Customer.objects.all(), ProjectType.objects.all(), Employee.objects.all()]
 
 
 class ProjectCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
@@ -750,6 +517,58 @@ class CapacityView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
         return context
 
 
+class AvailabilityView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+    model = Allocation
+    context_object_name = 'allocation'
+    queryset = Allocation.objects.none()
+    template_name = 'allocation/availability_view.html'
+    permission_required = 'resource_management_app.view_allocation'
+
+
+def save_allocation_details(allocation, days_of_week):
+    """
+    Bring the weekly AllocationDetail rows of an allocation in line with the selected days of week with
+    one bulk insert and one delete. Rows for days that are still selected keep their ids and versions.
+    """
+    days_of_week = {int(day) for day in days_of_week}
+    max_num_of_accurrences = (allocation.end_date - allocation.start_date).days
+
+    kept_days = set()
+    stale_ids = []
+    resized_details = []
+    for detail in AllocationDetail.objects.filter(allocation=allocation):
+        if detail.reccurring_type == 'weekly' and detail.day_of_week in days_of_week \
+                and detail.day_of_week not in kept_days:
+            kept_days.add(detail.day_of_week)
+            if detail.max_num_of_accurrences != max_num_of_accurrences:
+                # Allocation dates changed, the occurrence limit follows them
+                detail.max_num_of_accurrences = max_num_of_accurrences
+                detail.version += 1
+                resized_details.append(detail)
+        else:
+            stale_ids.append(detail.id)
+
+    new_details = [AllocationDetail(allocation=allocation,
+                                    day_of_week=day,
+                                    reccurring_type='weekly',
+                                    max_num_of_accurrences=max_num_of_accurrences,
+                                    version=1,
+                                    is_deleted=False)
+                   for day in sorted(days_of_week - kept_days)]
+
+    if not stale_ids and not resized_details and not new_details:
+        return
+
+    with batch_allocation_refresh():
+        if stale_ids:
+            AllocationDetail.objects.filter(id__in=stale_ids).delete()
+        if resized_details:
+            AllocationDetail.objects.bulk_update(resized_details, ['max_num_of_accurrences', 'version'])
+        AllocationDetail.objects.bulk_create(new_details)
+        # Bulk writes do not send signals
+        refresh_allocation(allocation.id)
+
+
 class AllocationCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     model = Allocation
     template_name = 'allocation/allocation_add_or_update.html'
@@ -775,22 +594,10 @@ class AllocationCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateVi
 
             form.instance.updated_by = self.request.user
             form.instance.created_by = self.request.user
-            allocation = form.save()
-
-            for day in form.cleaned_data['days_of_week']:
-                print(day)
-                detail = AllocationDetail()
-
-                detail.allocation = allocation
-                detail.day_of_week = day
-                detail.reccurring_type = 'weekly'
-                detail.max_num_of_accurrences = (allocation.end_date - allocation.start_date).days
-                detail.version += 1
-                detail.is_deleted = 0
-                detail.created_at = self.request.user
-                detail.updated_at = self.request.user
 
-                detail.save()
+            with transaction.atomic(), batch_allocation_refresh():
+                allocation = form.save()
+                save_allocation_details(allocation, form.cleaned_data['days_of_week'])
 
             return redirect('allocation-list')
             # return self.form_valid(form, allocation_daily_recurrence_formset, allocation_weekly_recurrence_formset)
@@ -822,26 +629,12 @@ class AllocationUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateVi
         form.instance.version += 1
         form.instance.updated_by = self.request.user
 
-        if form.is_valid():
-            allocation = form.save()
-
-            AllocationDetail.objects.filter(allocation=allocation).delete()
-
-            for day in form.cleaned_data['days_of_week']:
-                print(day)
-                detail = AllocationDetail()
-
-                detail.allocation = allocation
-                detail.day_of_week = day
-                detail.reccurring_type = 'weekly'
-                detail.max_num_of_accurrences = (allocation.end_date - allocation.start_date).days
-                detail.version += 1
-                detail.is_deleted = 0
-                detail.created_at = self.request.user
-                detail.updated_at = self.request.user
-                detail.save()
+        with transaction.atomic(), batch_allocation_refresh():
+            # Saves the allocation as self.object
+            response = super().form_valid(form)
+            save_allocation_details(self.object, form.cleaned_data['days_of_week'])
 
-        return super().form_valid(form)
+        return response
 
 class AllocationDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
     model = Allocation
@@ -852,7 +645,19 @@ class AllocationDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteVi
 
     def form_valid(self, form):
         messages.success(self.request, "The Allocation was deleted successfully.")
-        return super(AllocationDeleteView, self).form_valid(form)
+        # Deleting the details first would otherwise rebuild the allocation's days once per detail
+        with transaction.atomic(), batch_allocation_refresh():
+            return super(AllocationDeleteView, self).form_valid(form)
+
+def get_row_window(request):
+    # Optional ?offset=&limit= window over the timeline rows, everything when no limit is given
+    try:
+        offset = int(request.GET.get("offset") or 0)
+        limit = int(request.GET.get("limit")) if request.GET.get("limit") else None
+    except ValueError:
+        raise ParseError("offset and limit must be whole numbers")
+    return max(offset, 0), max(limit, 0) if limit is not None else None
+
 
 class AllocationListViewAPI(APIView):
 
@@ -860,14 +665,65 @@ class AllocationListViewAPI(APIView):
         start_date = parser.parse(self.request.GET.get("start_date")).date()
         end_date = parser.parse(self.request.GET.get("end_date")).date()
 
-        cal = TimeLineCalendar(start_date, end_date)
+        cal = TimeLineCalendar(start_date, end_date, compact=bool(self.request.GET.get("compact")))
 
-        html_cal = cal.gettimelinecalendar()
-        context = {"calendar": mark_safe(html_cal)}
+        return conditional_response(self.request, cal.get_timeline_querysets(), lambda: self.get_response(cal))
+
+    def get_response(self, cal):
+        start_date, end_date, compact = cal.start_date, cal.end_date, cal.compact
+        offset, limit = get_row_window(self.request)
+
+        if self.request.GET.get("stream"):
+            # Send the table as it is rendered instead of wrapping the whole document in JSON
+            return StreamingHttpResponse(cal.iter_timelinecalendar(offset, limit), content_type='text/html')
+
+        def build():
+            html_cal = cal.gettimelinecalendar(offset, limit)
+            return {"calendar": html_cal, "total_rows": cal.total_rows, "offset": offset, "limit": limit}
+
+        context = dict(calendar_cache.get_or_build('timeline', start_date, end_date,
+                                                   {'compact': compact, 'offset': offset, 'limit': limit}, build))
+        context["calendar"] = mark_safe(context["calendar"])
 
         return Response(context)
 
 
+class AllocationTimelineViewAPI(APIView):
+
+    def get(self, request):
+        start_date = parser.parse(self.request.GET.get("start_date")).date()
+        end_date = parser.parse(self.request.GET.get("end_date")).date()
+
+        compact = bool(self.request.GET.get("compact"))
+        cal = TimeLineCalendar(start_date, end_date, compact=compact)
+        offset, limit = get_row_window(self.request)
+
+        return conditional_response(
+            self.request, cal.get_timeline_querysets(),
+            lambda: Response(calendar_cache.get_or_build('timeline-data', start_date, end_date,
+                                                         {'compact': compact, 'offset': offset, 'limit': limit},
+                                                         lambda: cal.timelinecalendar_data(offset, limit))))
+
+
+class AllocationConflictViewAPI(APIView):
+
+    def get(self, request):
+        employee = get_object_or_404(Employee, pk=self.request.GET.get("employee"))
+        start_date = parser.parse(self.request.GET.get("start_date")).date()
+        end_date = parser.parse(self.request.GET.get("end_date")).date()
+        no_of_hours = int(self.request.GET.get("no_of_hours", 0))
+        # e.g. ?days_of_week=0,1,2 for Monday to Wednesday
+        days_of_week = [day for day in self.request.GET.get("days_of_week", "0,1,2,3,4").split(",") if day]
+
+        conflicts = find_allocation_conflicts(employee, start_date, end_date, no_of_hours, days_of_week,
+                                              exclude_allocation_id=self.request.GET.get("allocation"))
+
+        return Response({"employee": employee.id,
+                         "standard_hours": employee.standard_hours,
+                         "over_allocated_hours": sum(conflict["over_allocated_hours"] for conflict in conflicts),
+                         "conflicts": conflicts})
+
+
 class CapacityViewAPI(APIView):
 
     def get(self, request):
@@ -875,7 +731,169 @@ class CapacityViewAPI(APIView):
         end_date = parser.parse(self.request.GET.get("end_date")).date()
 
         cal = TimeLineCalendar(start_date, end_date)
-        html_cal = cal.capacitycalendar()
+
+        if self.request.GET.get("rollup"):
+            # Pre-aggregated week/month/quarter utilization, coarsest grain covering the range by default
+            return Response(get_utilization_rollups(start_date, end_date, self.request.GET.get("grain")))
+
+        return conditional_response(self.request, cal.get_capacity_querysets(), lambda: self.get_response(cal))
+
+    def get_response(self, cal):
+        start_date, end_date = cal.start_date, cal.end_date
+        # Cached for the whole weeks the capacity matrix covers
+        first_day, last_day = cal.get_capacity_range()
+
+        if self.request.GET.get("matrix"):
+            return Response(calendar_cache.get_or_build('capacity-data', first_day, last_day,
+                                                        {'start_date': start_date, 'end_date': end_date},
+                                                        cal.capacitycalendar_data))
+
+        if self.request.GET.get("stream"):
+            # Send the table as it is rendered instead of wrapping the whole document in JSON
+            return StreamingHttpResponse(cal.iter_capacitycalendar(), content_type='text/html')
+
+        html_cal = calendar_cache.get_or_build('capacity', first_day, last_day,
+                                               {'start_date': start_date, 'end_date': end_date},
+                                               cal.capacitycalendar)
         context = {"calendar": mark_safe(html_cal)}
 
         return Response(context)
+
+
+class AllocationListViewAsync(View):
+    """
+    Timeline calendar as AllocationListViewAPI (?data=1 for the structured timeline) for ASGI deployments.
+    Projects, allocations, flex squad, bank holidays and dates of the whole timeline are read concurrently
+    and the worker is not held while waiting on them.
+    """
+
+    async def get(self, request):
+        start_date = parser.parse(request.GET.get("start_date")).date()
+        end_date = parser.parse(request.GET.get("end_date")).date()
+        try:
+            offset, limit = get_row_window(request)
+        except ParseError as error:
+            return JsonResponse({"detail": error.detail}, status=error.status_code)
+
+        cal = TimeLineCalendar(start_date, end_date, compact=bool(request.GET.get("compact")))
+
+        return await aconditional_response(request, cal.get_timeline_querysets(),
+                                           lambda: self.get_response(request, cal, offset, limit))
+
+    async def get_response(self, request, cal, offset, limit):
+        start_date, end_date = cal.start_date, cal.end_date
+        filters = {'compact': cal.compact, 'offset': offset, 'limit': limit}
+
+        async def build(function):
+            # A window is read by COUNT queries and the rows inside it, see get_timeline_blocks()
+            if limit is None:
+                await cal.aload_timeline_data()
+            return await run_concurrently(function)
+
+        if request.GET.get("data"):
+            return JsonResponse(await calendar_cache.aget_or_build(
+                'timeline-data', start_date, end_date, filters,
+                lambda: build(lambda: cal.timelinecalendar_data(offset, limit))))
+
+        if request.GET.get("stream"):
+            if limit is None:
+                await cal.aload_timeline_data()
+            return StreamingHttpResponse(aiterate(cal.iter_timelinecalendar(offset, limit)), content_type='text/html')
+
+        def render():
+            html_cal = cal.gettimelinecalendar(offset, limit)
+            return {"calendar": html_cal, "total_rows": cal.total_rows, "offset": offset, "limit": limit}
+
+        # Shared with AllocationListViewAPI
+        return JsonResponse(await calendar_cache.aget_or_build('timeline', start_date, end_date, filters,
+                                                               lambda: build(render)))
+
+
+class CapacityViewAsync(View):
+    """ Capacity calendar as CapacityViewAPI (?matrix=1 for the weekly figures) for ASGI deployments """
+
+    async def get(self, request):
+        start_date = parser.parse(request.GET.get("start_date")).date()
+        end_date = parser.parse(request.GET.get("end_date")).date()
+
+        cal = TimeLineCalendar(start_date, end_date)
+
+        return await aconditional_response(request, cal.get_capacity_querysets(),
+                                           lambda: self.get_response(request, cal))
+
+    async def get_response(self, request, cal):
+        start_date, end_date = cal.start_date, cal.end_date
+        # Cached for the whole weeks the capacity matrix covers
+        first_day, last_day = cal.get_capacity_range()
+        filters = {'start_date': start_date, 'end_date': end_date}
+
+        async def build(function):
+            await cal.aload_capacity_matrix()
+            return await run_concurrently(function)
+
+        if request.GET.get("matrix"):
+            return JsonResponse(await calendar_cache.aget_or_build('capacity-data', first_day, last_day, filters,
+                                                                   lambda: build(cal.capacitycalendar_data)))
+
+        if request.GET.get("stream"):
+            await cal.aload_capacity_matrix()
+            return StreamingHttpResponse(aiterate(cal.iter_capacitycalendar()), content_type='text/html')
+
+        return JsonResponse({"calendar": await calendar_cache.aget_or_build('capacity', first_day, last_day, filters,
+                                                                            lambda: build(cal.capacitycalendar))})
+
+
+class EmployeeAllocationGridViewAPI(APIView):
+    """
+    Employees with their allocations, as AllocationGridSerializer series (?detail=1 for EmployeeSerializer).
+    With start_date and end_date only the allocations and dates within them are included.
+    """
+
+    def get_window(self):
+        if not self.request.GET.get("start_date") or not self.request.GET.get("end_date"):
+            return None, None
+        return parser.parse(self.request.GET.get("start_date")).date(), \
+            parser.parse(self.request.GET.get("end_date")).date()
+
+    def get_queryset(self, start_date=None, end_date=None):
+        # Everything the serializers read is prefetched: a constant number of queries whatever the number
+        # of employees and allocations
+        allocations = Allocation.objects.select_related('project', 'allocation_type')\
+            .prefetch_related('allocation_detail_allocation')\
+            .order_by('start_date', 'id')
+        if start_date and end_date:
+            allocations = allocations.filter(start_date__lte=end_date, end_date__gte=start_date)
+
+        return Employee.objects.select_related('job_title', 'line_manager')\
+            .prefetch_related('skills', Prefetch('employee_allocation', queryset=allocations))\
+            .order_by('id')
+
+    def get(self, request):
+        start_date, end_date = self.get_window()
+        serializer_class = EmployeeSerializer if self.request.GET.get("detail") else AllocationGridSerializer
+
+        return Response(serializer_class(self.get_queryset(start_date, end_date), many=True,
+                                         context={'start_date': start_date, 'end_date': end_date}).data)
+
+
+class AvailabilityViewAPI(APIView):
+
+    def get(self, request):
+        start_date = parser.parse(self.request.GET.get("start_date")).date()
+        end_date = parser.parse(self.request.GET.get("end_date")).date()
+        # e.g. ?min_free_hours=16 for employees with at least 16 free hours a week
+        min_free_hours = int(self.request.GET.get("min_free_hours") or 1)
+
+        return Response(get_availability(start_date, end_date, min_free_hours))
+
+
+class ResourceSearchViewAPI(APIView):
+
+    def get(self, request):
+        start_date = parser.parse(self.request.GET.get("start_date")).date()
+        end_date = parser.parse(self.request.GET.get("end_date")).date()
+        min_free_hours = int(self.request.GET.get("min_free_hours") or 1)
+        # e.g. ?skills=1,4 for employees having both skills
+        skill_ids = [int(skill_id) for skill_id in self.request.GET.get("skills", "").split(",") if skill_id]
+
+        return Response(search_resources(skill_ids, start_date, end_date, min_free_hours))